@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# in-process frequent itemset miner: vertical bitsets (one uint64 tid-bitset per item),
+# depth-first Eclat with a switch to dEclat diffsets on dense branches.
+# Called like the apriori/fpgrowth binaries so run_experiments can time it the same way:
+# Usage: python3 eclat.py -s<percent> <dataset> <output> [--workers N] [--tidsets]
+import os
+import sys
+import math
+import shutil
+import multiprocessing as mp
+import numpy as np
+
+if hasattr(np, 'bitwise_count'):
+    def popcount_rows(words):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    _BYTE_COUNTS = np.array([bin(b).count('1') for b in range(256)], dtype=np.uint8)
+
+    def popcount_rows(words):
+        return _BYTE_COUNTS[words.view(np.uint8)].reshape(*words.shape, 8).sum(axis=(-2, -1), dtype=np.int64)
+
+def load_transactions(path):
+    # one transaction per line, items separated by whitespace.
+    # returns (item names, (num_items x words) uint64 tid-bitsets, number of transactions)
+    if os.path.getsize(path):
+        arr = np.asarray(np.memmap(path, dtype=np.uint8, mode='r'))
+    else:
+        arr = np.zeros(0, np.uint8)
+    newlines = np.flatnonzero(arr == 10)
+    num_txns = len(newlines) + (1 if len(arr) and arr[-1] != 10 else 0)
+
+    # token boundaries from the whitespace mask
+    ws = np.empty(len(arr) + 2, dtype=np.int8)
+    ws[0] = ws[-1] = 1
+    np.less_equal(arr, 32, out=ws[1:-1].view(bool))
+    edges = np.diff(ws)
+    tok_start = np.flatnonzero(edges == -1)
+    tok_len = np.flatnonzero(edges == 1) - tok_start
+    tids = np.searchsorted(newlines, tok_start)
+
+    # tokens -> fixed-width byte strings -> item ids
+    width = max(1, int(tok_len.max()) if len(tok_len) else 1)
+    mat = np.zeros((len(tok_start), width), dtype=np.uint8)
+    for k in range(width):
+        has = tok_len > k
+        mat[has, k] = arr[tok_start[has] + k]
+    names, items = np.unique(mat.view(f'S{width}').ravel(), return_inverse=True)
+
+    # set bit tid of row item; duplicate items inside a transaction collapse
+    num_words = max(1, (num_txns + 63) // 64)
+    cell = np.unique(items.astype(np.int64) * (num_words * 64) + tids)
+    rows, tids = cell // (num_words * 64), cell % (num_words * 64)
+    bits = np.left_shift(np.uint64(1), (tids % 64).astype(np.uint64))
+    word_key = rows * num_words + tids // 64
+    starts = np.flatnonzero(np.concatenate([[True], word_key[1:] != word_key[:-1]])) if len(word_key) else word_key
+    bitsets = np.zeros(len(names) * num_words, dtype=np.uint64)
+    # bits within one word are distinct, so their sum is their OR
+    bitsets[word_key[starts]] = np.add.reduceat(bits, starts) if len(starts) else bits
+    return [n.decode() for n in names], bitsets.reshape(len(names), num_words), num_txns
+
+def mine(prefix, sets, sups, items, diff, min_count, emit, use_diffsets=True):
+    # sets[i]: tidset of prefix+items[i], or (diff) its diffset against the prefix tidset.
+    # items are ordered by ascending support, the usual Eclat order
+    for i in range(len(items)):
+        mine_item(i, prefix, sets, sups, items, diff, min_count, emit, use_diffsets)
+
+def mine_item(i, prefix, sets, sups, items, diff, min_count, emit, use_diffsets=True):
+    # prefix+items[i], then everything that extends it with items ranked after i
+    itemset = prefix + [items[i]]
+    emit(itemset, sups[i])
+    if i + 1 == len(items):
+        return
+    rest = sets[i + 1:]
+    if diff:
+        # d(PXY) = d(PY) - d(PX), sup(PXY) = sup(PX) - |d(PXY)|
+        child = rest & ~sets[i]
+        child_sups = sups[i] - popcount_rows(child)
+        child_diff = True
+    else:
+        child = rest & sets[i]
+        child_sups = popcount_rows(child)
+        child_diff = False
+        # dEclat switch: diffsets once they would be smaller than the tidsets
+        if use_diffsets and (sups[i] - child_sups).sum() < child_sups.sum():
+            child = sets[i] & ~rest
+            child_diff = True
+    keep = np.flatnonzero(child_sups >= min_count)
+    if len(keep) == 0:
+        return
+    keep = keep[np.argsort(child_sups[keep], kind='stable')]
+    child = child[keep]
+    # words that are zero in every child stay zero further down, drop them
+    child = child[:, child.any(axis=0)]
+    mine(itemset, child, child_sups[keep], [items[i + 1 + k] for k in keep.tolist()],
+         child_diff, min_count, emit, use_diffsets)
+
+_MINER = {}
+
+def _line_writer(f, names, num_txns):
+    # Borgelt-style "a b c (support%)" lines
+    def emit(itemset, sup):
+        f.write(' '.join(names[k] for k in itemset) + f" ({100.0 * sup / num_txns:.1f})\n")
+    return emit
+
+def frequent_itemsets(dataset_path, output_path, support_percent, workers=1, use_diffsets=True):
+    names, bitsets, num_txns = load_transactions(dataset_path)
+    # -s<percent>: an itemset is frequent if it is in at least percent% of the transactions
+    min_count = max(1, math.ceil(support_percent / 100.0 * num_txns - 1e-9))
+    sups = popcount_rows(bitsets)
+    frequent = np.flatnonzero(sups >= min_count)
+    frequent = frequent[np.argsort(sups[frequent], kind='stable')]
+    sets, sups, items = bitsets[frequent], sups[frequent], frequent.tolist()
+
+    if workers <= 1 or len(items) < 2:
+        with open(output_path, 'w', buffering=1 << 20) as f:
+            mine([], sets, sups, items, False, min_count, _line_writer(f, names, num_txns), use_diffsets)
+        return
+
+    # one task per first-level prefix; forked workers inherit the bitsets
+    _MINER.update(sets=sets, sups=sups, items=items, names=names, num_txns=num_txns,
+                  min_count=min_count, output=output_path, use_diffsets=use_diffsets)
+    with mp.get_context('fork').Pool(workers) as pool:
+        parts = pool.map(first_level, range(len(items)), chunksize=1)
+    with open(output_path, 'wb') as out:
+        for part in parts:
+            with open(part, 'rb') as f:
+                shutil.copyfileobj(f, out, 1 << 20)
+            os.remove(part)
+
+def first_level(i):
+    # subtree of the i-th frequent item, written to its own part file; the parent concatenates them in order
+    m = _MINER
+    part = f"{m['output']}.part{i}"
+    with open(part, 'w', buffering=1 << 20) as f:
+        mine_item(i, [], m['sets'], m['sups'], m['items'], False, m['min_count'],
+                  _line_writer(f, m['names'], m['num_txns']), m['use_diffsets'])
+    return part
+
+def main():
+    args, opts = [], {}
+    argv = sys.argv[1:]
+    i = 0
+    while i < len(argv):
+        if argv[i] == '--workers' and i + 1 < len(argv):
+            opts['workers'] = int(argv[i + 1])
+            i += 2
+        elif argv[i] == '--tidsets':
+            opts['tidsets'] = True
+            i += 1
+        elif argv[i].startswith('-s'):
+            opts['support'] = float(argv[i][2:])
+            i += 1
+        else:
+            args.append(argv[i])
+            i += 1
+    if len(args) != 2 or 'support' not in opts:
+        print("Usage: python3 eclat.py -s<percent> <dataset> <output> [--workers N] [--tidsets]")
+        sys.exit(1)
+
+    # --tidsets keeps plain Eclat (no switch to diffsets)
+    frequent_itemsets(args[0], args[1], opts['support'], opts.get('workers', 1), not opts.get('tidsets'))
+
+if __name__ == "__main__":
+    main()
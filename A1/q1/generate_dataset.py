@@ -1,53 +1,115 @@
 # took help of gemini to fix bugs and logic.
 
 import sys
-import random
+import multiprocessing as mp
+import numpy as np
+
+# cells (transactions x items) per generated block, keeps each Bernoulli matrix around 8 MB
+BLOCK_CELLS = 1 << 23
+
+def item_digits(universe_size):
+    # ascii digits of every item id 1..universe_size, one zero-padded row per item
+    ids = np.arange(1, universe_size + 1)
+    lens = np.char.str_len(ids.astype(str)).astype(np.int64)
+    width = int(lens.max())
+    digits = np.zeros((universe_size, width), dtype=np.uint8)
+    for k in range(width):
+        # digit k counted from the left
+        place = 10 ** np.maximum(lens - 1 - k, 0)
+        digits[:, k] = np.where(lens > k, 48 + (ids // place) % 10, 0)
+    return digits, lens
+
+def format_block(present, digits, lens):
+    # boolean (txns x items) -> "i j k\n" lines; nonzero walks rows in order and items ascending
+    rows, cols = np.nonzero(present)
+    tok_len = lens[cols]
+    # every token is followed by a space, or a newline when it is the last one of its row
+    starts = np.zeros(len(cols) + 1, dtype=np.int64)
+    np.cumsum(tok_len + 1, out=starts[1:])
+    out = np.empty(starts[-1], dtype=np.uint8)
+    for k in range(digits.shape[1]):
+        has = tok_len > k
+        out[starts[:-1][has] + k] = digits[cols[has], k]
+    last = np.ones(len(rows), dtype=bool)
+    last[:-1] = rows[1:] != rows[:-1]
+    out[starts[1:] - 1] = np.where(last, 10, 32)
+    return out.tobytes()
+
+_PARAMS = {}
+
+def generate_block(block):
+    # every block has its own seed derived from (seed, block index), so the output
+    # does not depend on how many workers generated it
+    universe_size, num_transactions, block_rows, seed = _PARAMS['args']
+    digits, lens = _PARAMS['digits'], _PARAMS['lens']
+    rng = np.random.default_rng([seed, block])
+    n = min(block_rows, num_transactions - block * block_rows)
 
-def generate_dataset(universe_size, num_transactions, output_path, seed=42):
-    random.seed(seed)
-    
     # High Freq Group: ~35% of items, freq ~70%
     num_high = min(12, int(universe_size * 0.35))
-    high_items = list(range(1, num_high + 1))
     plateau_prob = 0.70
-    
     # Low Freq Group: Remaining items, freq ~8%
-    low_items = list(range(num_high + 1, universe_size + 1))
     spike_prob = 0.08
-    
+
+    present = np.empty((n, universe_size), dtype=bool)
+    # High Group (Correlated)
+    present[:, :num_high] = (rng.random(n) < plateau_prob)[:, None]
+    # Low Group (Independent)
+    present[:, num_high:] = rng.random((n, universe_size - num_high), dtype=np.float32) < spike_prob
+
+    # empty transactions get item 1
+    present[~present.any(axis=1), 0] = True
+    return format_block(present, digits, lens)
+
+def generate_dataset(universe_size, num_transactions, output_path, seed=42, workers=1):
+    block_rows = max(1024, BLOCK_CELLS // universe_size)
+    num_blocks = (num_transactions + block_rows - 1) // block_rows
+    digits, lens = item_digits(universe_size)
+    _PARAMS.update(args=(universe_size, num_transactions, block_rows, seed), digits=digits, lens=lens)
+
     print(f"Generating dataset (N={universe_size}, Txns={num_transactions})")
-    
-    with open(output_path, 'w') as f:
-        for t in range(num_transactions):
-            transaction = []
-            
-            # High Group (Correlated)
-            if random.random() < plateau_prob:
-                transaction.extend(high_items)
-            
-            # Low Group (Independent)
-            for item_id in low_items:
-                if random.random() < spike_prob:
-                    transaction.append(item_id)
-            
-            if not transaction:
-                transaction.append(1)
-                
-            f.write(' '.join(map(str, sorted(transaction))) + '\n')
-            
-            if (t+1) % 50000 == 0:
-                print(f"  {t+1:,} transactions...", flush=True)
+
+    pool = None
+    if workers > 1:
+        # forked workers inherit _PARAMS; imap hands the blocks back in order
+        pool = mp.get_context('fork').Pool(workers)
+        blocks = pool.imap(generate_block, range(num_blocks))
+    else:
+        blocks = map(generate_block, range(num_blocks))
+
+    try:
+        with open(output_path, 'wb', buffering=1 << 22) as f:
+            for b, data in enumerate(blocks):
+                f.write(data)
+                done = min(num_transactions, (b + 1) * block_rows)
+                if done // 50000 > (done - block_rows) // 50000:
+                    print(f"  {done:,} transactions...", flush=True)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
 def main():
-    if len(sys.argv) != 4:
-        print("Usage: python3 generate_dataset.py <size> <txns> <out>")
+    # positional <size> <txns> <out>, plus optional --workers N / --seed S
+    args, opts = [], {}
+    argv = sys.argv[1:]
+    i = 0
+    while i < len(argv):
+        if argv[i] in ('--workers', '--seed') and i + 1 < len(argv):
+            opts[argv[i][2:]] = int(argv[i + 1])
+            i += 2
+        else:
+            args.append(argv[i])
+            i += 1
+    if len(args) != 3:
+        print("Usage: python3 generate_dataset.py <size> <txns> <out> [--workers N] [--seed S]")
         sys.exit(1)
-    
-    u_size = int(sys.argv[1])
-    n_txns = int(sys.argv[2])
-    out = sys.argv[3]
-    
-    generate_dataset(u_size, n_txns, out)
+
+    u_size = int(args[0])
+    n_txns = int(args[1])
+    out = args[2]
+
+    generate_dataset(u_size, n_txns, out, opts.get('seed', 42), opts.get('workers', 1))
 
 if __name__ == "__main__":
     main()
@@ -3,98 +3,287 @@ import subprocess
 import sys
 import time
 import os
+import json
+import signal
+import resource
+import tempfile
 import matplotlib.pyplot as plt
 
-def run_algorithm(executable_path, dataset_path, output_path, support_threshold, timeout=3600):
+THRESHOLDS = [5, 10, 25, 50, 90]
+
+# allocation failures as reported by C++ (std::bad_alloc), C (strerror ENOMEM) and Python
+OOM_MESSAGES = ('std::bad_alloc', 'Cannot allocate memory', 'MemoryError', 'out of memory')
+
+def _memory_cap(limit_bytes):
+    # runs in the child before exec: address-space cap, so an over-budget job fails on its own
+    def apply():
+        resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, limit_bytes))
+    return apply
+
+def start_job(executable_path, dataset_path, output_path, support_threshold, mem_limit_mb=None):
     cmd = [executable_path, f"-s{support_threshold}", dataset_path, output_path]
-    start_time = time.time()
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=timeout)
-    except subprocess.TimeoutExpired:
-        print(f"TIMEOUT ({timeout}s)")
+    stdout, stderr = tempfile.TemporaryFile(), tempfile.TemporaryFile()
+    preexec = _memory_cap(int(mem_limit_mb * 1024 * 1024)) if mem_limit_mb else None
+    proc = subprocess.Popen(cmd, stdout=stdout, stderr=stderr, preexec_fn=preexec)
+    return {'proc': proc, 'stdout': stdout, 'stderr': stderr, 'start': time.monotonic(),
+            'output': output_path, 'mem_limit_mb': mem_limit_mb, 'killed': False}
+
+def poll_job(job, timeout):
+    # None while the job runs; the finished result dict once it exits (killed past its timeout)
+    proc = job['proc']
+    if not job['killed'] and time.monotonic() - job['start'] > timeout:
+        # os.kill, not send_signal: Popen would reap the child itself and lose its rusage
+        os.kill(proc.pid, signal.SIGKILL)
+        job['killed'] = True
+    pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+    if pid == 0:
+        return None
+    wall = time.monotonic() - job['start']
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    result = {'seconds': wall, 'cpu_seconds': usage.ru_utime + usage.ru_stime,
+              'peak_rss_mb': usage.ru_maxrss / 1024, 'returncode': proc.returncode}
+    result['status'] = _classify(job, result, timeout)
+    _write_marker(job['output'], result, timeout)
+    for f in (job['stdout'], job['stderr']):
+        f.close()
+    return result
+
+def _classify(job, result, timeout):
+    rc = result['returncode']
+    job['stderr'].seek(0)
+    stderr = job['stderr'].read().decode(errors='replace')
+    if job['killed']:
+        return 'timeout'
+    if rc == 0:
+        return 'ok'
+    if rc == 15 or "no (frequent) items found" in stderr:
+        return 'empty'
+    # out of memory: killed by the kernel, an allocation failure the binary reported,
+    # or a crash right at the address-space cap. anything else is an error, not a reason to skip
+    near_cap = job['mem_limit_mb'] and result['peak_rss_mb'] >= 0.9 * job['mem_limit_mb']
+    if rc == -signal.SIGKILL or any(msg in stderr for msg in OOM_MESSAGES) or \
+            (near_cap and rc in (-signal.SIGABRT, -signal.SIGSEGV)):
+        return 'oom'
+    job['stdout'].seek(0)
+    result['error'] = f"stdout: {job['stdout'].read().decode(errors='replace')}\nstderr: {stderr}"
+    return 'error'
+
+def _write_marker(output_path, result, timeout):
+    # same output files as before for the runs that produced no itemsets
+    if result['status'] == 'timeout':
+        result['seconds'] = timeout
         with open(output_path, 'w') as f:
             f.write(f"# TIMEOUT after {timeout} seconds\n")
-        return timeout
-    except subprocess.CalledProcessError as e:
-        if hasattr(e, 'returncode') and e.returncode < 0 and -e.returncode == 9:
-            end_time = time.time()
-            runtime = end_time - start_time
-            print(f"OOM ERROR (killed after {runtime:.1f}s)")
-            with open(output_path, 'w') as f:
-                f.write(f"# OUT OF MEMORY after {runtime:.1f} seconds\n")
-            return runtime
-        
-        if e.returncode == 15 or "no (frequent) items found" in e.stderr:
-            end_time = time.time()
-            with open(output_path, 'w') as f:
-                f.write("")
-            return end_time - start_time
+    elif result['status'] == 'oom':
+        with open(output_path, 'w') as f:
+            f.write(f"# OUT OF MEMORY after {result['seconds']:.1f} seconds\n")
+    elif result['status'] == 'empty':
+        with open(output_path, 'w') as f:
+            f.write("")
+
+def run_algorithm(executable_path, dataset_path, output_path, support_threshold, timeout=3600, mem_limit_mb=None):
+    # one run to completion; returns the wall time (the timeout when it hit it)
+    job = start_job(executable_path, dataset_path, output_path, support_threshold, mem_limit_mb)
+    while True:
+        result = poll_job(job, timeout)
+        if result is not None:
+            break
+        time.sleep(0.05)
+    if result['status'] == 'timeout':
+        print(f"TIMEOUT ({timeout}s)")
+    elif result['status'] == 'oom':
+        print(f"OOM ERROR (killed after {result['seconds']:.1f}s)")
+    elif result['status'] == 'error':
         print(f"Error running {executable_path} at {support_threshold}% support:")
-        print(f"  stdout: {e.stdout}")
-        print(f"  stderr: {e.stderr}")
-        raise
-    
-    return time.time() - start_time
+        print(result['error'])
+        raise RuntimeError(f"{executable_path} exited with {result['returncode']}")
+    return result['seconds']
+
+def load_cache(path, tag):
+    # finished jobs from an earlier (possibly interrupted) sweep with the same inputs
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            saved = json.load(f)
+        if saved.get('tag') == tag:
+            return saved['jobs']
+    return {}
+
+def save_cache(path, tag, jobs):
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'tag': tag, 'jobs': jobs}, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+def schedule(jobs, cache, cache_file, tag, timeout, cores, mem_budget_mb, job_mem_mb, cap_memory=False):
+    # jobs: (algo, executable, threshold, output) ordered high threshold first per algorithm.
+    # runs them concurrently while both the core and the memory budget allow (job_mem_mb is
+    # reserved per job, and only enforced as a cap with cap_memory); once a threshold
+    # times out or runs out of memory, every lower threshold of that algorithm is skipped
+    # (and killed if already running), since lower support only means more work
+    pending = [j for j in jobs if f"{j[0]}:{j[2]}" not in cache]
+    running = {}
+    dataset_path = tag['dataset']
+
+    def failed_above(algo, threshold):
+        for key, res in cache.items():
+            a, t = key.split(':')
+            if a == algo and int(t) > threshold and res['status'] in ('timeout', 'oom', 'skipped'):
+                return int(t), res
+        return None
+
+    def record(key, result):
+        cache[key] = result
+        save_cache(cache_file, tag, cache)
+        extra = f" (cpu {result['cpu_seconds']:.2f}s, peak {result['peak_rss_mb']:.1f} MB)" if 'cpu_seconds' in result else ""
+        print(f"  {key.replace(':', ' ')}%: {result['status']} {result['seconds']:.2f}s{extra}", flush=True)
+
+    while pending or running:
+        # skip (or stop) lower thresholds under a failed one
+        for j in list(pending) + [r['spec'] for r in running.values()]:
+            algo, _, threshold, output = j
+            key = f"{algo}:{threshold}"
+            hit = failed_above(algo, threshold)
+            if hit is None:
+                continue
+            if key in running:
+                job = running.pop(key)
+                os.kill(job['proc'].pid, signal.SIGKILL)
+                os.wait4(job['proc'].pid, 0)
+                job['proc'].returncode = -signal.SIGKILL
+                for f in (job['stdout'], job['stderr']):
+                    f.close()
+            else:
+                pending.remove(j)
+            with open(output, 'w') as f:
+                f.write(f"# SKIPPED: {hit[1]['status']} already at {hit[0]}% support\n")
+            record(key, {'status': 'skipped', 'seconds': hit[1]['seconds'], 'after': hit[0]})
+
+        # start what fits
+        for j in list(pending):
+            reserved = len(running) * job_mem_mb
+            if len(running) >= cores or reserved + job_mem_mb > mem_budget_mb:
+                break
+            algo, executable, threshold, output = j
+            pending.remove(j)
+            job = start_job(executable, dataset_path, output, threshold, job_mem_mb if cap_memory else None)
+            job['spec'] = j
+            running[f"{algo}:{threshold}"] = job
+
+        # reap what finished
+        reaped = False
+        for key, job in list(running.items()):
+            result = poll_job(job, timeout)
+            if result is None:
+                continue
+            del running[key]
+            reaped = True
+            if result['status'] == 'error':
+                # not cached, so a rerun tries it again
+                print(f"Error running {job['spec'][1]} at {job['spec'][2]}% support:\n{result['error']}")
+                continue
+            record(key, result)
+        if not reaped:
+            time.sleep(0.05)
+    return cache
 
 def generate_plot(results, output_folder):
-    thresholds = [5, 10, 25, 50, 90]
+    thresholds = THRESHOLDS
     plt.figure(figsize=(10, 6))
-    
+
     # Plot Apriori
     apriori_times = [results['apriori'][t] for t in thresholds]
     plt.plot(thresholds, apriori_times, marker='o', linewidth=2, markersize=8, label='Apriori')
-    
+
     # Plot FP-Growth
     fp_times = [results['fpgrowth'][t] for t in thresholds]
     plt.plot(thresholds, fp_times, marker='s', linewidth=2, markersize=8, label='FP-Growth')
-    
+
+    # Plot the built-in Eclat miner (--eclat)
+    if 'eclat' in results:
+        ec_times = [results['eclat'][t] for t in thresholds]
+        plt.plot(thresholds, ec_times, marker='^', linewidth=2, markersize=8, label='Eclat (eclat.py)')
+
     plt.xlabel('Minimum Support Threshold (%)', fontsize=12)
     plt.ylabel('Runtime (seconds)', fontsize=12)
     plt.title('Runtime Comparison: Apriori vs FP-Growth', fontsize=14)
     plt.legend(fontsize=11)
     plt.grid(True, alpha=0.3)
     plt.xticks(thresholds)
-    
+
     plot_path = os.path.join(output_folder, 'plot.png')
     plt.savefig(plot_path, dpi=150, bbox_inches='tight')
     plt.close()
     print(f"Plot saved to: {plot_path}")
 
 def main():
-    if len(sys.argv) != 5:
-        print("Usage: python3 run_experiments.py <apriori> <fpgrowth> <dataset> <output_folder>")
+    # positional <apriori> <fpgrowth> <dataset> <output_folder>, plus optional
+    # --cores N, --mem-budget MB, --job-mem MB, --timeout S, --fresh, --eclat
+    args, opts = [], {}
+    argv = sys.argv[1:]
+    i = 0
+    while i < len(argv):
+        if argv[i] in ('--cores', '--mem-budget', '--job-mem', '--timeout') and i + 1 < len(argv):
+            opts[argv[i][2:]] = float(argv[i + 1])
+            i += 2
+        elif argv[i] in ('--fresh', '--eclat'):
+            opts[argv[i][2:]] = True
+            i += 1
+        else:
+            args.append(argv[i])
+            i += 1
+    if len(args) != 4:
+        print("Usage: python3 run_experiments.py <apriori> <fpgrowth> <dataset> <output_folder>"
+              " [--cores N] [--mem-budget MB] [--job-mem MB] [--timeout S] [--fresh] [--eclat]")
         sys.exit(1)
-    
-    apriori_path = sys.argv[1]
-    fp_path = sys.argv[2]
-    dataset_path = sys.argv[3]
-    output_folder = sys.argv[4]
-    
-    thresholds = [5, 10, 25, 50, 90]
-    results = {'apriori': {}, 'fpgrowth': {}}
-    
-    print(f"Running experiments on {dataset_path}...")
-    
-    print("Apriori:")
-    for threshold in reversed(thresholds):
-        out = os.path.join(output_folder, f"ap{threshold}")
-        print(f"  {threshold}%...", end=" ", flush=True)
-        t = run_algorithm(apriori_path, dataset_path, out, threshold)
-        results['apriori'][threshold] = t
-        print(f"{t:.2f}s" + (" (T)" if t>=3600 else ""))
-    
-    print("FP-Growth:")
-    for threshold in reversed(thresholds):
-        out = os.path.join(output_folder, f"fp{threshold}")
-        print(f"  {threshold}%...", end=" ", flush=True)
-        t = run_algorithm(fp_path, dataset_path, out, threshold)
-        results['fpgrowth'][threshold] = t
-        print(f"{t:.2f}s" + (" (T)" if t>=3600 else ""))
-    
+
+    apriori_path, fp_path, dataset_path, output_folder = args
+
+    thresholds = THRESHOLDS
+    timeout = opts.get('timeout', 3600)
+    cores = int(opts.get('cores', os.cpu_count() or 1))
+    # default budget: 80% of physical memory, split evenly over the cores for scheduling.
+    # jobs are only capped (RLIMIT_AS) when --job-mem is given: the cap is on address space,
+    # not RSS, and would turn runs that fit into oom
+    physical_mb = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1024 * 1024)
+    mem_budget_mb = opts.get('mem-budget', 0.8 * physical_mb)
+    cap_memory = 'job-mem' in opts
+    job_mem_mb = opts.get('job-mem', mem_budget_mb / cores)
+
+    # cached results are only reused for the same dataset, binaries and limits
+    stat = os.stat(dataset_path)
+    tag = {'dataset': os.path.abspath(dataset_path), 'size': stat.st_size, 'mtime': stat.st_mtime,
+           'apriori': os.path.abspath(apriori_path), 'fpgrowth': os.path.abspath(fp_path),
+           'timeout': timeout, 'job_mem_mb': job_mem_mb if cap_memory else None}
+    cache_file = os.path.join(output_folder, 'results.json')
+    cache = {} if opts.get('fresh') else load_cache(cache_file, tag)
+    if cache:
+        print(f"Resuming: {len(cache)} runs already in {cache_file}")
+
+    cap_note = f", capped at {job_mem_mb:.0f} MB each" if cap_memory else ""
+    print(f"Running experiments on {dataset_path} ({cores} concurrent jobs{cap_note})...")
+
+    jobs = []
+    algorithms = [('apriori', apriori_path, 'ap'), ('fpgrowth', fp_path, 'fp')]
+    if opts.get('eclat'):
+        # the in-process miner takes the same -s<percent> <dataset> <output> arguments
+        algorithms.append(('eclat', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eclat.py'), 'ec'))
+    for algo, exe, prefix in algorithms:
+        for threshold in reversed(thresholds):
+            jobs.append((algo, exe, threshold, os.path.join(output_folder, f"{prefix}{threshold}")))
+    cache = schedule(jobs, cache, cache_file, tag, timeout, cores, mem_budget_mb, job_mem_mb, cap_memory)
+
+    results = {algo: {} for algo, _, _ in algorithms}
+    for algo in results:
+        for th in thresholds:
+            res = cache.get(f"{algo}:{th}")
+            results[algo][th] = res['seconds'] if res else float('nan')
+
     print("Summary:")
     for th in thresholds:
-        print(f"{th}%: Ap={results['apriori'][th]:.2f}s, FP={results['fpgrowth'][th]:.2f}s")
-    
+        line = f"{th}%: Ap={results['apriori'][th]:.2f}s, FP={results['fpgrowth'][th]:.2f}s"
+        if 'eclat' in results:
+            line += f", Eclat={results['eclat'][th]:.2f}s"
+        print(line)
+
     generate_plot(results, output_folder)
 
 if __name__ == "__main__":
@@ -2,82 +2,67 @@
 # took some help from LLM to understand the data formats
 import sys
 
-def parse_yeast_format(input_file):
+def iter_yeast_graphs(input_file):
+    # yields one graph at a time; the label maps fill up as new labels show up,
+    # so ids match what a full parse would assign (order of first appearance)
     atom_label_map = {}
     bond_label_map = {}
-    next_atom_id = 0
-    next_bond_id = 0
-    graphs = []
-    
-    with open(input_file, 'r') as f:
-        lines = f.readlines()
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        if not line:
-            i += 1
-            continue
-        
-        if line.startswith('#'):
+
+    with open(input_file, 'r', buffering=1 << 20) as f:
+        for line in f:
+            line = line.strip()
+
+            if not line.startswith('#'):
+                continue
+
             mol_id = line[1:]
             graph_data = {'id': mol_id, 'atoms': [], 'bonds': []}
-            i += 1
-            
-            num_atoms = int(lines[i].strip())
-            i += 1
-            
+
+            num_atoms = int(next(f).strip())
             for _ in range(num_atoms):
-                atom_str = lines[i].strip()
+                atom_str = next(f).strip()
                 if atom_str not in atom_label_map:
-                    atom_label_map[atom_str] = next_atom_id
-                    next_atom_id += 1
+                    atom_label_map[atom_str] = len(atom_label_map)
                 graph_data['atoms'].append(atom_label_map[atom_str])
-                i += 1
-            
-            num_edges = int(lines[i].strip())
-            i += 1
-            
+
+            num_edges = int(next(f).strip())
             for _ in range(num_edges):
-                parts = lines[i].strip().split()
+                parts = next(f).strip().split()
                 u = int(parts[0])
                 v = int(parts[1])
                 bond_str = parts[2]
-                
+
                 if bond_str not in bond_label_map:
-                    bond_label_map[bond_str] = next_bond_id
-                    next_bond_id += 1
-                
+                    bond_label_map[bond_str] = len(bond_label_map)
+
                 if u > v:
                     u, v = v, u
-                
+
                 graph_data['bonds'].append((u, v, bond_label_map[bond_str]))
-                i += 1
-            
-            graphs.append(graph_data)
-        else:
-            i += 1
-    
-    return graphs
 
-def to_fsg_format(graphs, output_file):
-    with open(output_file, 'w') as f:
-        for graph in graphs:
-            f.write(f"t # {graph['id']}\n")
-            for node_id, label in enumerate(graph['atoms']):
-                f.write(f"v {node_id} {label}\n")
-            for u, v, label in graph['bonds']:
-                f.write(f"u {u} {v} {label}\n")
+            yield graph_data
+
+def fsg_text(graph):
+    lines = [f"t # {graph['id']}"]
+    lines.extend(f"v {node_id} {label}" for node_id, label in enumerate(graph['atoms']))
+    lines.extend(f"u {u} {v} {label}" for u, v, label in graph['bonds'])
+    return '\n'.join(lines) + '\n'
+
+def gspan_text(graph, index):
+    lines = [f"t # {index}"]
+    lines.extend(f"v {node_id} {label}" for node_id, label in enumerate(graph['atoms']))
+    lines.extend(f"e {u} {v} {label}" for u, v, label in graph['bonds'])
+    return '\n'.join(lines) + '\n'
 
-def to_gspan_format(graphs, output_file):
-    with open(output_file, 'w') as f:
-        for i, graph in enumerate(graphs):
-            f.write(f"t # {i}\n")
-            for node_id, label in enumerate(graph['atoms']):
-                f.write(f"v {node_id} {label}\n")
-            for u, v, label in graph['bonds']:
-                f.write(f"e {u} {v} {label}\n")
+def convert(input_file, fsg_output, gspan_output):
+    # single pass: every graph is written to both outputs as soon as it is parsed
+    count = 0
+    with open(fsg_output, 'w', buffering=1 << 20) as fsg, open(gspan_output, 'w', buffering=1 << 20) as gspan:
+        for i, graph in enumerate(iter_yeast_graphs(input_file)):
+            fsg.write(fsg_text(graph))
+            gspan.write(gspan_text(graph, i))
+            count += 1
+    return count
 
 def main():
     if len(sys.argv) != 4:
@@ -88,9 +73,7 @@ def main():
     fsg_output = sys.argv[2]
     gspan_output = sys.argv[3]
     
-    graphs = parse_yeast_format(input_file)
-    to_fsg_format(graphs, fsg_output)
-    to_gspan_format(graphs, gspan_output)
+    convert(input_file, fsg_output, gspan_output)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
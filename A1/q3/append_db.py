@@ -0,0 +1,248 @@
+# incremental append: new graphs are vectorized against the existing schema and
+# stored as segments next to db_vecs.npy, listed in <db_vecs>_manifest.json.
+# smart_filter/query_server load base + segments; a background re-identification
+# is started once too many appended graphs fall outside the schema, and --adopt
+# re-vectorizes base + segments with that schema once it is written.
+import os
+import sys
+import json
+import subprocess
+import numpy as np
+from graph_utils import parse_graphs, iter_graphs, load_compact_graphs, split_args
+from graph_store import compile_store, load_store, iter_store_graphs
+from feature_index import pack_bits, is_count_matrix, build_postings, save_postings, postings_path
+from convert_to_histogram import vectorize
+from identify_features import scan_graphs, build_schema, add_paths
+
+def manifest_path(db_vec_path):
+    return os.path.splitext(db_vec_path)[0] + '_manifest.json'
+
+def load_manifest(db_vec_path):
+    path = manifest_path(db_vec_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_manifest(db_vec_path, manifest):
+    # written to a temp file first so readers never see half a manifest
+    path = manifest_path(db_vec_path)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+def segment_files(db_vec_path, manifest):
+    # (vecs .npy, graph store dir) for every segment, resolved next to the manifest
+    base_dir = os.path.dirname(os.path.abspath(db_vec_path))
+    return [(os.path.join(base_dir, seg['vecs']), os.path.join(base_dir, seg['graphs']))
+            for seg in manifest['segments']]
+
+def load_db_graphs(db_vec_path, db_graph_path, node_vocab, edge_vocab):
+    # compact graphs of the base followed by every segment, in the same row order as the vecs
+    graphs = load_compact_graphs(db_graph_path, node_vocab, edge_vocab)
+    manifest = load_manifest(db_vec_path)
+    if manifest is not None:
+        for _, seg_store in segment_files(db_vec_path, manifest):
+            graphs += load_compact_graphs(seg_store, node_vocab, edge_vocab)
+    return graphs
+
+def db_fingerprint(db_vec_path, db_graph_path):
+    # path, size and mtime of the db files and manifest; changes with every reconvert or append
+    files = [db_vec_path, db_graph_path, manifest_path(db_vec_path)]
+    return json.dumps([(os.path.abspath(p), os.path.getsize(p), os.path.getmtime(p)) for p in files if os.path.exists(p)])
+
+def merge_postings(parts):
+    # concatenates per-feature lists; ids of later parts are shifted past the earlier ones
+    offsets_list, ids_list = [], []
+    shift = 0
+    for p in parts:
+        offsets_list.append(p['offsets'])
+        ids_list.append(p['ids'] + shift)
+        shift += int(p['num_graphs'])
+    num_feats = len(offsets_list[0]) - 1
+    counts = sum(np.diff(o) for o in offsets_list)
+    offsets = np.zeros(num_feats + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    ids = np.empty(offsets[-1], dtype=np.int32)
+    for f in range(num_feats):
+        ids[offsets[f]:offsets[f + 1]] = np.concatenate(
+            [part_ids[o[f]:o[f + 1]] for o, part_ids in zip(offsets_list, ids_list)])
+    return {'offsets': offsets, 'ids': ids, 'num_graphs': np.int64(shift), 'counts': parts[0]['counts']}
+
+def pattern_support(db_vec_path, manifest):
+    # edge pattern -> number of graphs containing it over base + segments. kept in the
+    # manifest so each append only scans its own batch; older manifests get one full scan
+    if 'pattern_support' not in manifest:
+        support = {}
+        for _, graphs in db_parts(db_vec_path, manifest):
+            for pat, c in scan_graphs(graphs)[0].items():
+                support[pat] = support.get(pat, 0) + c
+        manifest['pattern_support'] = [[*pat, c] for pat, c in support.items()]
+    return {tuple(row[:3]): row[3] for row in manifest['pattern_support']}
+
+def entering_patterns(support, total_graphs, schema):
+    # patterns a re-identification over the whole db would add to the top-50 edge patterns,
+    # with the same minsup and ranking as identify_features
+    top, _ = build_schema(support, set(schema["node_labels"]), schema["max_degree"], total_graphs)
+    return set(top["frequent_edge_patterns"]) - {tuple(p) for p in schema["frequent_edge_patterns"]}
+
+def out_of_schema(graphs, schema, entering):
+    # a graph drifts if it has a node label the schema lacks, a degree above max_degree,
+    # or an edge pattern that would enter the schema if it were re-identified now
+    known_labels = set(schema["node_labels"])
+    drifted = 0
+    for g in graphs:
+        node_labels = g['nodes']
+        patterns = set()
+        degrees = {}
+        for src, dst, edge_lbl in g['edges']:
+            src_lbl, dst_lbl = node_labels[src], node_labels[dst]
+            patterns.add((dst_lbl, edge_lbl, src_lbl) if src_lbl > dst_lbl else (src_lbl, edge_lbl, dst_lbl))
+            degrees[src] = degrees.get(src, 0) + 1
+            degrees[dst] = degrees.get(dst, 0) + 1
+        if (not set(node_labels.values()) <= known_labels
+                or max(degrees.values(), default=0) > schema["max_degree"] or patterns & entering):
+            drifted += 1
+    return drifted
+
+def save_vecs(vecs_path, feat_matrix, base_dtype, with_postings):
+    # same representation as the base matrix: counts, packed bits or dense 0/1.
+    # postings are written after the vecs so they pass the mtime check at load
+    counts = base_dtype in (np.uint8, np.uint16)
+    postings = build_postings(feat_matrix, counts) if with_postings else None
+    if base_dtype == np.uint64:
+        feat_matrix = pack_bits(feat_matrix)
+    elif not counts:
+        feat_matrix = feat_matrix.astype(base_dtype)
+    np.save(vecs_path, feat_matrix)
+    if postings is not None:
+        save_postings(postings_path(vecs_path), postings)
+
+def append(db_vec_path, db_graph_path, schema_file, new_graphs_file, drift_threshold):
+    with open(schema_file, 'r') as f:
+        schema = json.load(f)
+    version = schema.get("version", 1)
+
+    manifest = load_manifest(db_vec_path)
+    if manifest is None:
+        base = np.load(db_vec_path, mmap_mode='r')
+        manifest = {'schema': os.path.abspath(schema_file), 'schema_version': version,
+                    'base_graphs': os.path.abspath(db_graph_path), 'base_count': int(base.shape[0]),
+                    'segments': [], 'total_graphs': int(base.shape[0]), 'out_of_schema': 0}
+    elif manifest['schema_version'] != version:
+        print(f"Error: {schema_file} is version {version}, the db was built with version {manifest['schema_version']}. Rebuild first.")
+        sys.exit(1)
+
+    base = np.load(db_vec_path, mmap_mode='r')
+    graphs = parse_graphs(new_graphs_file)
+    counts = is_count_matrix(base)
+    feat_matrix = vectorize(graphs, schema, counts, base.dtype if counts else np.uint8)
+
+    seg_id = len(manifest['segments']) + 1
+    stem = os.path.splitext(os.path.basename(db_vec_path))[0]
+    seg_vecs = f"{stem}_seg{seg_id:03d}.npy"
+    seg_graphs = f"{stem}_seg{seg_id:03d}.store"
+    base_dir = os.path.dirname(os.path.abspath(db_vec_path))
+
+    # support over the db before this batch, then with it
+    support = pattern_support(db_vec_path, manifest)
+    for pat, c in scan_graphs(graphs)[0].items():
+        support[pat] = support.get(pat, 0) + c
+    manifest['pattern_support'] = [[*pat, c] for pat, c in support.items()]
+
+    save_vecs(os.path.join(base_dir, seg_vecs), feat_matrix, base.dtype, os.path.exists(postings_path(db_vec_path)))
+    compile_store(graphs, os.path.join(base_dir, seg_graphs))
+
+    drifted = out_of_schema(graphs, schema, entering_patterns(support, manifest['total_graphs'] + len(graphs), schema))
+    manifest['segments'].append({'vecs': seg_vecs, 'graphs': seg_graphs, 'count': len(graphs)})
+    manifest['total_graphs'] += len(graphs)
+    manifest['out_of_schema'] += drifted
+    drift = manifest['out_of_schema'] / max(1, manifest['total_graphs'])
+    print(f"Appended {len(graphs)} graphs as segment {seg_id} ({drifted} outside the schema, drift {drift:.3f})")
+
+    if drift > drift_threshold and 'pending_schema' not in manifest:
+        # re-identify in the background; the new schema is only picked up by --adopt
+        # named after the db, not the schema: several dbs can share one schema file
+        new_schema = os.path.abspath(os.path.splitext(db_vec_path)[0] + f"_schema.v{version + 1}.json")
+        manifest['pending_schema'] = new_schema
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--reidentify', db_vec_path],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        print(f"Drift above {drift_threshold}: re-identifying schema in the background -> {new_schema}")
+    save_manifest(db_vec_path, manifest)
+
+def reidentify(db_vec_path):
+    manifest = load_manifest(db_vec_path)
+    with open(manifest['schema'], 'r') as f:
+        old_schema = json.load(f)
+
+    def all_graphs():
+        for _, graphs in db_parts(db_vec_path, manifest):
+            yield from graphs
+
+    if old_schema.get("paths"):
+        # the old schema had mined path columns (identify --paths): mine them again with the
+        # same settings, which needs the graphs in memory like identify does
+        settings = old_schema.get("path_settings") or {
+            "max_len": max(len(p) // 2 for p in old_schema["paths"]), "max_paths": 50, "gamma": 2.0}
+        graphs = list(all_graphs())
+        schema, min_count = build_schema(*scan_graphs(graphs), version=manifest['schema_version'] + 1)
+        add_paths(schema, graphs, min_count, settings["max_len"], settings["max_paths"], settings["gamma"])
+    else:
+        schema, _ = build_schema(*scan_graphs(all_graphs()), version=manifest['schema_version'] + 1)
+    # written to a temp file first so --adopt never reads half a schema
+    with open(manifest['pending_schema'] + '.tmp', 'w') as f:
+        json.dump(schema, f)
+    os.replace(manifest['pending_schema'] + '.tmp', manifest['pending_schema'])
+
+def db_parts(db_vec_path, manifest):
+    # (vecs .npy, graph iterator) for the base and then every segment
+    yield db_vec_path, iter_graphs(manifest['base_graphs'])
+    for seg_vecs, store_dir in segment_files(db_vec_path, manifest):
+        yield seg_vecs, iter_store_graphs(load_store(store_dir))
+
+def adopt(db_vec_path):
+    # switch the db to the re-identified schema: every vecs file is rebuilt in place and the
+    # drift count starts over, so a later drift can trigger another re-identification
+    manifest = load_manifest(db_vec_path)
+    if manifest is None or 'pending_schema' not in manifest:
+        print(f"Nothing to adopt: no re-identified schema pending for {db_vec_path}")
+        sys.exit(1)
+    if not os.path.exists(manifest['pending_schema']):
+        print(f"{manifest['pending_schema']} is not written yet (re-identification still running?)")
+        sys.exit(1)
+    with open(manifest['pending_schema'], 'r') as f:
+        schema = json.load(f)
+
+    base = np.load(db_vec_path, mmap_mode='r')
+    counts, base_dtype = is_count_matrix(base), base.dtype
+    # the base file is rewritten below, drop the mapping first
+    del base
+    with_postings = os.path.exists(postings_path(db_vec_path))
+    for vecs_path, graphs in db_parts(db_vec_path, manifest):
+        feat_matrix = vectorize(list(graphs), schema, counts, base_dtype if counts else np.uint8)
+        save_vecs(vecs_path, feat_matrix, base_dtype, with_postings)
+
+    manifest['schema'] = os.path.abspath(manifest.pop('pending_schema'))
+    manifest['schema_version'] = schema.get('version', manifest['schema_version'] + 1)
+    manifest['out_of_schema'] = 0
+    save_manifest(db_vec_path, manifest)
+    print(f"Adopted {manifest['schema']} (version {manifest['schema_version']}) for {manifest['total_graphs']} graphs; "
+          f"reconvert the query vectors with it.")
+
+def main():
+    args, opts = split_args(sys.argv[1:], value_opts=('drift-threshold', 'reidentify', 'adopt'))
+    if 'reidentify' in opts:
+        reidentify(opts['reidentify'])
+        return
+    if 'adopt' in opts:
+        adopt(opts['adopt'])
+        return
+    if len(args) < 4:
+        print("Usage: python append_db.py <db_npy> <db_graphs> <schema_file> <new_graphs> [--drift-threshold F]")
+        print("       python append_db.py --adopt <db_npy>   (switch to the re-identified schema once it is written)")
+        sys.exit(1)
+
+    append(args[0], args[1], args[2], args[3], float(opts.get('drift-threshold', 0.10)))
+
+if __name__ == "__main__":
+    main()
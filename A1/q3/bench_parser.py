@@ -0,0 +1,34 @@
+# micro-benchmark: line-by-line parse_text_graphs vs the bulk fast_parse, in MB/s
+# Usage: python bench_parser.py <graphs_file> [more files...] [--repeat N]
+import os
+import sys
+import time
+from graph_utils import parse_text_graphs, split_args
+from graph_store import fast_parse, num_graphs
+
+def best_time(fn, path, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    args, opts = split_args(sys.argv[1:], value_opts=('repeat',))
+    if not args:
+        print("Usage: python bench_parser.py <graphs_file> [more files...] [--repeat N]")
+        sys.exit(1)
+    repeat = int(opts.get('repeat', 3))
+
+    print(f"{'file':40s} {'graphs':>8s} {'MB':>8s} {'text MB/s':>10s} {'fast MB/s':>10s} {'speedup':>8s}")
+    for path in args:
+        mb = os.path.getsize(path) / 1e6
+        t_text = best_time(parse_text_graphs, path, repeat)
+        t_fast = best_time(fast_parse, path, repeat)
+        n = num_graphs(fast_parse(path))
+        print(f"{os.path.basename(os.path.dirname(path)) + '/' + os.path.basename(path):40s} {n:8d} {mb:8.2f} "
+              f"{mb / t_text:10.2f} {mb / t_fast:10.2f} {t_text / t_fast:7.2f}x")
+
+if __name__ == "__main__":
+    main()
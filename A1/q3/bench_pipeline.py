@@ -0,0 +1,180 @@
+# synthetic scalability benchmark for the q3 pipeline (identify -> convert -> filter).
+# Usage: python bench_pipeline.py <results_json> [--sizes 10000,100000,1000000] [--nodes 10-40]
+#        [--labels 12] [--edge-labels 3] [--queries 100] [--query-nodes 4-10] [--workdir DIR] [--seed S]
+#        [--filter-args "--workers 8 --counts"]
+import os
+import sys
+import json
+import time
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+from graph_utils import split_args
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def label_weights(num_labels):
+    # zipf-like skew, the way a few atoms dominate molecule data
+    w = 1.0 / np.arange(1, num_labels + 1)
+    return w / w.sum()
+
+def random_graph(rng, n, weights, num_edge_labels):
+    # random spanning tree plus ~n/6 extra edges for rings
+    labels = rng.choice(len(weights), size=n, p=weights)
+    edges = {(int(rng.integers(0, i)), i) for i in range(1, n)}
+    for _ in range(n // 6):
+        a, b = rng.choice(n, size=2, replace=False)
+        edges.add((int(min(a, b)), int(max(a, b))))
+    return labels, [(a, b, int(rng.integers(0, num_edge_labels))) for a, b in sorted(edges)]
+
+def sample_query(rng, labels, edges, size):
+    # connected subgraph grown from a random node, so every query has at least one answer
+    adj = {}
+    for a, b, l in edges:
+        adj.setdefault(a, []).append((b, l))
+        adj.setdefault(b, []).append((a, l))
+    start = int(rng.integers(0, len(labels)))
+    picked = [start]
+    seen = {start}
+    while len(picked) < size:
+        frontier = [v for u in picked for v, _ in adj.get(u, []) if v not in seen]
+        if not frontier:
+            break
+        v = frontier[int(rng.integers(0, len(frontier)))]
+        seen.add(v)
+        picked.append(v)
+    local = {v: k for k, v in enumerate(picked)}
+    q_edges = [(local[a], local[b], l) for a, b, l in edges if a in local and b in local]
+    return [labels[v] for v in picked], q_edges
+
+def write_graph(f, idx, labels, edges):
+    f.write(f"t # {idx}\n")
+    for i, lbl in enumerate(labels):
+        f.write(f"v {i} L{lbl}\n")
+    for a, b, l in edges:
+        f.write(f"e {a} {b} {l}\n")
+
+def generate(db_path, q_path, num_graphs, node_range, num_labels, num_edge_labels, num_queries, q_range, seed):
+    rng = np.random.default_rng(seed)
+    weights = label_weights(num_labels)
+    query_sources = set(rng.choice(num_graphs, size=min(num_queries, num_graphs), replace=False).tolist())
+    queries = []
+    with open(db_path, 'w', buffering=1 << 20) as f:
+        for i in range(num_graphs):
+            labels, edges = random_graph(rng, int(rng.integers(node_range[0], node_range[1] + 1)), weights, num_edge_labels)
+            write_graph(f, i, labels, edges)
+            if i in query_sources:
+                queries.append(sample_query(rng, labels, edges, int(rng.integers(q_range[0], q_range[1] + 1))))
+    with open(q_path, 'w') as f:
+        for i, (labels, edges) in enumerate(queries):
+            write_graph(f, i, labels, edges)
+
+def timed_run(cmd):
+    # wall time, cpu time and peak RSS of one stage, taken from wait4
+    # stderr goes to a temp file, a pipe nobody reads while we wait would fill up and block the child
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=stderr)
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"{' '.join(cmd)} failed: {stderr.read().decode(errors='replace')}")
+    return {'seconds': wall, 'cpu_seconds': usage.ru_utime + usage.ru_stime, 'peak_rss_mb': usage.ru_maxrss / 1024}
+
+def candidate_sizes(path):
+    sizes = []
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith('c #'):
+                sizes.append(len(line.split()) - 2)
+    return sizes
+
+def bench_size(workdir, num_graphs, opts):
+    node_range = [int(x) for x in opts.get('nodes', '10-40').split('-')]
+    q_range = [int(x) for x in opts.get('query-nodes', '4-10').split('-')]
+    num_queries = int(opts.get('queries', 100))
+    extra_convert = ['--counts'] if opts.get('counts') else []
+    extra_filter = opts.get('filter-args', '').split()
+
+    db_txt = os.path.join(workdir, f"db_{num_graphs}.txt")
+    q_txt = os.path.join(workdir, f"q_{num_graphs}.txt")
+    schema = os.path.join(workdir, f"schema_{num_graphs}.json")
+    db_npy = os.path.join(workdir, f"db_{num_graphs}.npy")
+    q_npy = os.path.join(workdir, f"q_{num_graphs}.npy")
+    out = os.path.join(workdir, f"cand_{num_graphs}.dat")
+
+    start = time.perf_counter()
+    generate(db_txt, q_txt, num_graphs, node_range, int(opts.get('labels', 12)), int(opts.get('edge-labels', 3)),
+             num_queries, q_range, int(opts.get('seed', 0)))
+    gen_seconds = time.perf_counter() - start
+
+    py = sys.executable
+    stages = {
+        'identify': timed_run([py, os.path.join(SCRIPT_DIR, 'identify_features.py'), db_txt, schema]),
+        'convert_db': timed_run([py, os.path.join(SCRIPT_DIR, 'convert_to_histogram.py'), db_txt, schema, db_npy] + extra_convert),
+        'convert_queries': timed_run([py, os.path.join(SCRIPT_DIR, 'convert_to_histogram.py'), q_txt, schema, q_npy] + extra_convert),
+        'filter': timed_run([py, os.path.join(SCRIPT_DIR, 'smart_filter.py'), db_npy, q_npy, db_txt, q_txt, out] + extra_filter),
+    }
+    stages['identify']['graphs_per_s'] = num_graphs / stages['identify']['seconds']
+    stages['convert_db']['graphs_per_s'] = num_graphs / stages['convert_db']['seconds']
+    sizes = candidate_sizes(out)
+    stages['filter']['queries_per_s'] = len(sizes) / stages['filter']['seconds']
+
+    return {
+        'db_graphs': num_graphs, 'queries': len(sizes),
+        'db_mb': os.path.getsize(db_txt) / 1e6, 'generate_seconds': gen_seconds,
+        'stages': stages,
+        'candidates': {'avg': float(np.mean(sizes)) if sizes else 0.0, 'max': max(sizes, default=0),
+                       'avg_fraction': float(np.mean(sizes)) / num_graphs if sizes else 0.0},
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    args, opts = split_args(sys.argv[1:], value_opts=('sizes', 'nodes', 'labels', 'edge-labels', 'queries',
+                                                      'query-nodes', 'workdir', 'seed', 'filter-args'))
+    if len(args) < 1:
+        print("Usage: python bench_pipeline.py <results_json> [--sizes 10000,100000,1000000] [--nodes 10-40]"
+              " [--labels 12] [--edge-labels 3] [--queries 100] [--query-nodes 4-10] [--workdir DIR]"
+              " [--seed S] [--counts] [--filter-args \"...\"]")
+        sys.exit(1)
+
+    results_path = args[0]
+    sizes = [int(x) for x in opts.get('sizes', '10000,100000,1000000').split(',')]
+    workdir = opts.get('workdir') or tempfile.mkdtemp(prefix='q3_bench_')
+    os.makedirs(workdir, exist_ok=True)
+
+    run = {'revision': git_revision(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+           'params': {k: v for k, v in opts.items() if k != 'workdir'}, 'results': []}
+    try:
+        for n in sizes:
+            print(f"Benchmarking {n} graphs...", flush=True)
+            res = bench_size(workdir, n, opts)
+            run['results'].append(res)
+            for name, st in res['stages'].items():
+                print(f"  {name:16s} {st['seconds']:8.2f}s  cpu {st['cpu_seconds']:8.2f}s  peak {st['peak_rss_mb']:8.1f} MB")
+            print(f"  avg candidates {res['candidates']['avg']:.1f} ({res['candidates']['avg_fraction'] * 100:.2f}% of db)")
+    finally:
+        if 'workdir' not in opts:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    # one run per entry, so results from different revisions can be compared side by side
+    history = []
+    if os.path.exists(results_path):
+        with open(results_path, 'r') as f:
+            history = json.load(f)
+    history.append(run)
+    with open(results_path, 'w') as f:
+        json.dump(history, f, indent=1)
+    print(f"Results appended to {results_path}")
+
+if __name__ == "__main__":
+    main()
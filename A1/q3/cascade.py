@@ -0,0 +1,59 @@
+# pluggable filter cascade between the histogram index and exact verification.
+# every stage declares a per-candidate cost; the order is re-ranked per query class
+# from the prune rate and time per candidate measured on earlier queries
+import time
+
+class Stage:
+    # apply(candidates, ctx) -> surviving db indices; prepare(Q) -> ctx, built once per query.
+    # cost is the expected microseconds per candidate, used until real timings come in
+    __slots__ = ('name', 'cost', 'apply', 'prepare')
+
+    def __init__(self, name, cost, apply, prepare=None):
+        self.name = name
+        self.cost = cost
+        self.apply = apply
+        self.prepare = prepare
+
+class Cascade:
+    def __init__(self, stages, adaptive=True, prior=16):
+        self.stages = list(stages)
+        self.adaptive = adaptive
+        # weight of the declared cost and a 50% pass rate, in candidates
+        self.prior = prior
+        # (query class, stage name) -> [candidates in, candidates out, seconds]
+        self.stats = {}
+
+    def rank(self, stage, qclass):
+        # expected cost per candidate removed; cheapest first is the optimal order for independent filters
+        n_in, n_out, seconds = self.stats.get((qclass, stage.name), (0, 0, 0.0))
+        pass_rate = (n_out + 0.5 * self.prior) / (n_in + self.prior)
+        cost = (seconds + stage.cost * 1e-6 * self.prior) / (n_in + self.prior)
+        return cost / max(1.0 - pass_rate, 1e-6)
+
+    def order(self, qclass):
+        if not self.adaptive:
+            return sorted(self.stages, key=lambda s: s.cost)
+        return sorted(self.stages, key=lambda s: self.rank(s, qclass))
+
+    def run(self, Q, candidates, qclass):
+        # returns the survivors and (name, seconds, in, out) for every stage that ran
+        stages = []
+        for stage in self.order(qclass):
+            if len(candidates) == 0:
+                break
+            start = time.perf_counter()
+            ctx = stage.prepare(Q) if stage.prepare is not None else Q
+            n_in = len(candidates)
+            candidates = stage.apply(candidates, ctx)
+            seconds = time.perf_counter() - start
+            slot = self.stats.setdefault((qclass, stage.name), [0, 0, 0.0])
+            slot[0] += n_in
+            slot[1] += len(candidates)
+            slot[2] += seconds
+            stages.append((stage.name, seconds, n_in, len(candidates)))
+        return candidates, stages
+
+    def summary(self):
+        # current order per query class, for logging
+        classes = sorted({c for c, _ in self.stats})
+        return {c: [s.name for s in self.order(c)] for c in classes}
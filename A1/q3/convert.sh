@@ -16,4 +16,5 @@ OUTPUT_FILE=$3
 
 echo "Converting graphs to histogram vectors..."
 
-python3 "$SCRIPT_DIR/convert_to_histogram.py" "$INPUT_GRAPHS" "$SCHEMA_FILE" "$OUTPUT_FILE"
\ No newline at end of file
+# extra flags (--packed, --postings) are passed through
+python3 "$SCRIPT_DIR/convert_to_histogram.py" "$INPUT_GRAPHS" "$SCHEMA_FILE" "$OUTPUT_FILE" "${@:4}"
\ No newline at end of file
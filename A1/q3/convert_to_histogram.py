@@ -1,83 +1,232 @@
 # took help of gemini to fix bugs and logic.
+import os
 import sys
 import json
+import multiprocessing as mp
 import numpy as np
-from graph_utils import parse_graphs
+from graph_utils import load_graph_store, graph_chunks, chunk_num_graphs, load_chunk_store, labeled_paths, split_args
+from graph_store import build_store, num_graphs, iter_store_graphs
+from feature_index import pack_bits, unpack_bits, build_postings, save_postings, postings_path
+
+COUNT_DTYPES = {'uint8': np.uint8, 'uint16': np.uint16}
+
+def schema_maps(schema):
+    # column layout: labels | edge patterns | degrees | mined paths
+    lbl_map = {lbl: i for i, lbl in enumerate(schema["node_labels"])}
+    pattern_map = {tuple(pat): i for i, pat in enumerate(schema["frequent_edge_patterns"])}
+    num_deg_feats = schema["max_degree"] + 1 if "max_degree" in schema else 0
+    # mined paths (identify --paths) go after the degree columns
+    path_map = {tuple(p): i for i, p in enumerate(schema.get("paths", []))}
+    return lbl_map, pattern_map, num_deg_feats, path_map
+
+def _last_per_group(keys_lo, keys_hi):
+    # index of the last row of every distinct (lo, hi) pair, in row order
+    order = np.lexsort((np.arange(len(keys_lo)), keys_hi, keys_lo))
+    lo, hi = keys_lo[order], keys_hi[order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = (lo[1:] != lo[:-1]) | (hi[1:] != hi[:-1])
+    return np.sort(order[last])
+
+def store_matrix(store, schema, counts=False, count_dtype=np.uint8):
+    # feature matrix straight from the store arrays: one pass of array ops over all
+    # nodes/edges instead of a python loop per graph. the only featurizer; dict-form
+    # graphs (appends, server queries) go through vectorize, which builds a store first.
+    # counts: degree column d counts nodes with degree >= d, saturated at the dtype max.
+    # presence: bits 0..max degree, so containment stays a valid test
+    lbl_map, pattern_map, num_deg_feats, path_map = schema_maps(schema)
+    num_lbl_feats, num_pattern_feats = len(lbl_map), len(pattern_map)
+    deg_base = num_lbl_feats + num_pattern_feats
+    path_base = deg_base + num_deg_feats
+    total_feats = path_base + len(path_map)
+    G = num_graphs(store)
+
+    n_off = np.asarray(store['graph_node_offsets'])
+    e_off = np.asarray(store['graph_edge_offsets'])
+    node_labels = np.asarray(store['node_labels'], dtype=np.int64)
+    edge_labels = np.asarray(store['edge_labels'], dtype=np.int64)
+    node_graph = np.repeat(np.arange(G), np.diff(n_off))
+    edge_graph = np.repeat(np.arange(G), np.diff(e_off))
+    # endpoints as global node positions
+    src = np.asarray(store['edge_src'], dtype=np.int64) + n_off[edge_graph]
+    dst = np.asarray(store['edge_dst'], dtype=np.int64) + n_off[edge_graph]
+
+    # (graph, column) hits, scattered into the matrix at the end
+    rows, cols = [], []
+
+    # node labels
+    node_vocab, edge_vocab = list(store['node_vocab']), list(store['edge_vocab'])
+    lbl_col = np.array([lbl_map.get(l, -1) for l in node_vocab] or [-1], dtype=np.int64)
+    node_col = lbl_col[node_labels]
+    hit = node_col >= 0
+    rows.append(node_graph[hit]); cols.append(node_col[hit])
+
+    # edge patterns: (label, edge label, label) encoded as one int over the store vocabs,
+    # oriented by string order of the labels like identify_features, then a sorted-key lookup
+    nv, ev = max(len(node_vocab), 1), max(len(edge_vocab), 1)
+    rank = np.zeros(nv, dtype=np.int64)
+    rank[sorted(range(len(node_vocab)), key=node_vocab.__getitem__)] = np.arange(len(node_vocab))
+    node_id = {l: i for i, l in enumerate(node_vocab)}
+    edge_id = {l: i for i, l in enumerate(edge_vocab)}
+    pat_keys, pat_cols = [], []
+    for (a, e, b), col in pattern_map.items():
+        if a in node_id and b in node_id and e in edge_id:
+            pat_keys.append((node_id[a] * ev + edge_id[e]) * nv + node_id[b])
+            pat_cols.append(num_lbl_feats + col)
+    pat_keys, pat_cols = np.array(pat_keys, dtype=np.int64), np.array(pat_cols, dtype=np.int64)
+    by_key = np.argsort(pat_keys)
+    pat_keys, pat_cols = pat_keys[by_key], pat_cols[by_key]
+
+    if counts:
+        # undirected edges counted once, last label wins for repeated pairs
+        keep = _last_per_group(np.minimum(src, dst), np.maximum(src, dst))
+        src, dst, edge_labels, edge_graph = src[keep], dst[keep], edge_labels[keep], edge_graph[keep]
+    if len(pat_keys):
+        ls, ld = node_labels[src], node_labels[dst]
+        swap = rank[ls] > rank[ld]
+        keys = (np.where(swap, ld, ls) * ev + edge_labels) * nv + np.where(swap, ls, ld)
+        pos = np.minimum(np.searchsorted(pat_keys, keys), len(pat_keys) - 1)
+        hit = pat_keys[pos] == keys
+        rows.append(edge_graph[hit]); cols.append(pat_cols[pos[hit]])
+
+    # degrees from one bincount over the endpoints
+    deg = None
+    if num_deg_feats > 0:
+        if counts:
+            ends = np.concatenate([src, dst[dst != src]])
+        else:
+            # presence mode skips repeats of the same (pair, label) and counts self loops twice
+            uniq = _last_per_group(np.minimum(src, dst), (np.maximum(src, dst) << 32) | edge_labels)
+            ends = np.concatenate([src[uniq], dst[uniq]])
+        deg = np.minimum(np.bincount(ends, minlength=len(node_labels)), num_deg_feats - 1)
+
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    if counts:
+        matrix = np.bincount(rows * total_feats + cols, minlength=G * total_feats).reshape(G, total_feats)
+        if deg is not None:
+            # column d counts nodes with degree >= d: reverse cumsum of the per-graph degree histogram
+            hist = np.bincount(node_graph * num_deg_feats + deg, minlength=G * num_deg_feats)
+            matrix[:, deg_base:path_base] = np.cumsum(hist.reshape(G, num_deg_feats)[:, ::-1], axis=1)[:, ::-1]
+    else:
+        matrix = np.zeros((G, total_feats), dtype=np.int32)
+        matrix[rows, cols] = 1
+        if deg is not None:
+            # bits 0..max degree of the graph, the presence form of the >= d count columns
+            max_deg = np.full(G, -1, dtype=np.int64)
+            np.maximum.at(max_deg, node_graph, deg)
+            matrix[:, deg_base:path_base] = np.arange(num_deg_feats)[None, :] <= max_deg[:, None]
+
+    # mined paths still walk each graph, only when the schema has them
+    if path_map:
+        max_path_len = max(len(p) // 2 for p in path_map)
+        for i, g in enumerate(iter_store_graphs(store)):
+            for key, c in labeled_paths(g, max_path_len).items():
+                if key in path_map:
+                    matrix[i, path_base + path_map[key]] = c if counts else 1
+
+    if counts:
+        np.clip(matrix, 0, np.iinfo(count_dtype).max, out=matrix)
+        return matrix.astype(count_dtype)
+    return matrix
+
+def vectorize(graphs, schema, counts=False, count_dtype=np.uint8):
+    # parse_graphs dicts -> in-memory store arrays -> store_matrix
+    return store_matrix(build_store(graphs), schema, counts, count_dtype)
+
+def _chunk_rows(task):
+    return chunk_num_graphs(*task)
+
+def convert_chunk(task):
+    # featurize one chunk and write its rows straight into the preallocated output
+    graphs_file, chunk, row_start, output_file, schema, counts, count_dtype, packed = task
+    matrix = store_matrix(load_chunk_store(graphs_file, chunk), schema, counts, count_dtype)
+    if packed:
+        matrix = pack_bits(matrix)
+    out = np.load(output_file, mmap_mode='r+')
+    out[row_start:row_start + len(matrix)] = matrix
+    out.flush()
+    return len(matrix)
+
+def convert_parallel(graphs_file, schema, output_file, counts, count_dtype, packed, workers):
+    # chunks split on graph headers (or store graph ranges); rows counted first so every
+    # worker knows where its slice of the memory-mapped .npy starts
+    lbl_map, pattern_map, num_deg_feats, path_map = schema_maps(schema)
+    total_feats = len(lbl_map) + len(pattern_map) + num_deg_feats + len(path_map)
+    if not output_file.endswith('.npy'):
+        output_file += '.npy'  # same name np.save would pick
+    chunks = graph_chunks(graphs_file, workers)
+    with mp.Pool(workers) as pool:
+        rows = pool.map(_chunk_rows, [(graphs_file, chunk) for chunk in chunks])
+        starts = np.concatenate([[0], np.cumsum(rows, dtype=np.int64)]).tolist()
+        if packed:
+            dtype, shape = np.uint64, (starts[-1], (total_feats + 63) // 64)
+        else:
+            dtype, shape = (count_dtype if counts else np.int32), (starts[-1], total_feats)
+        np.lib.format.open_memmap(output_file, mode='w+', dtype=dtype, shape=shape).flush()
+        tasks = [(graphs_file, chunk, starts[k], output_file, schema, counts, count_dtype, packed)
+                 for k, chunk in enumerate(chunks)]
+        written = pool.map(convert_chunk, tasks)
+    assert written == rows, "graph count of a chunk changed between passes"
+    return output_file, starts[-1], total_feats
 
 def main():
-    if len(sys.argv) < 4:
-        print("Usage: python convert_to_histogram.py <graphs_file> <schema_file> <output_npy>")
+    args, opts = split_args(sys.argv[1:], value_opts=('dtype', 'workers'))
+    if len(args) < 3:
+        print("Usage: python convert_to_histogram.py <graphs_file> <schema_file> <output_npy>"
+              " [--packed] [--postings] [--counts [--dtype uint8|uint16]] [--workers N]")
         sys.exit(1)
 
-    graphs_file = sys.argv[1]
-    schema_file = sys.argv[2]
-    output_file = sys.argv[3]
+    graphs_file = args[0]
+    schema_file = args[1]
+    output_file = args[2]
+    # --packed writes uint64 bitset words instead of the dense 0/1 matrix
+    packed = bool(opts.get('packed'))
+    # --postings also writes per-feature graph-id lists next to the output
+    postings = bool(opts.get('postings'))
+    # --counts writes saturating occurrence counts (uint8 by default) for tighter pruning
+    counts = bool(opts.get('counts'))
+    count_dtype = COUNT_DTYPES[opts.get('dtype', 'uint8')]
+    # --workers N featurizes chunks in a process pool, writing into a memory-mapped output
+    workers = int(opts.get('workers', 1))
+    if counts and packed:
+        print("--packed only applies to the 0/1 presence matrix, not --counts")
+        sys.exit(1)
 
     with open(schema_file, 'r') as f:
         schema = json.load(f)
-    
-    lbl_map = {lbl: i for i, lbl in enumerate(schema["node_labels"])}
-    pattern_map = {tuple(pat): i for i, pat in enumerate(schema["frequent_edge_patterns"])}
-    num_lbl_feats = len(schema["node_labels"])
-    num_pattern_feats = len(schema["frequent_edge_patterns"])
-    num_deg_feats = schema["max_degree"] + 1 if "max_degree" in schema else 0
-    total_feats = num_lbl_feats + num_pattern_feats + num_deg_feats
-
-    graphs = parse_graphs(graphs_file)
-    feat_matrix = np.zeros((len(graphs), total_feats), dtype=np.int32)  # 0/1 binary
-
-    print(f"Vectorizing {len(graphs)} graphs (binary presence of labels, edges, degrees)...")
-
-    for i, g in enumerate(graphs):
-        # Binary Labels
-        present_labels = set(g['nodes'].values())
-        for lbl in present_labels:
-            if lbl in lbl_map:
-                feat_matrix[i, lbl_map[lbl]] = 1
-        
-        # Binary Frequent Edge Patterns
-        node_labels = g['nodes']
-        present_patterns = set()
-        for src, dst, edge_lbl in g['edges']:
-            src_lbl = node_labels[src]
-            dst_lbl = node_labels[dst]
-            if src_lbl > dst_lbl:
-                pattern = (dst_lbl, edge_lbl, src_lbl)
-            else:
-                pattern = (src_lbl, edge_lbl, dst_lbl)
-            if pattern in pattern_map:
-                present_patterns.add(pattern)
-        
-        for pat in present_patterns:
-            feat_matrix[i, num_lbl_feats + pattern_map[pat]] = 1
-
-        # Binary Degrees 
-        if num_deg_feats > 0:
-            degrees = {}
-            edges_seen = set()
-            
-            # Handling undirected graphs: skipping duplicate edges
-            for src, dst, edge_lbl in g['edges']:
-                edge_key = (min(src, dst), max(src, dst), edge_lbl)
-                
-                if edge_key in edges_seen:
-                    continue  # Skip duplicate edge
-                edges_seen.add(edge_key)
-                
-                # Count degree for both endpoints
-                degrees[src] = degrees.get(src, 0) + 1
-                degrees[dst] = degrees.get(dst, 0) + 1
-                
-            present_degrees = set()
-            for nid in g['nodes']:
-                d = degrees.get(nid, 0)
-                if d >= num_deg_feats: d = num_deg_feats - 1
-                present_degrees.add(d)
-            
-            for d in present_degrees:
-                feat_matrix[i, num_lbl_feats + num_pattern_feats + d] = 1
 
+    # posting lists from an earlier conversion would no longer match this matrix
+    if not postings and os.path.exists(postings_path(output_file)):
+        os.remove(postings_path(output_file))
+
+    if workers > 1:
+        npy_file, num, total_feats = convert_parallel(graphs_file, schema, output_file, counts, count_dtype, packed, workers)
+        print(f"Vectorized {num} graphs in {workers} workers")
+        if postings:
+            matrix = np.load(npy_file, mmap_mode='r')
+            save_postings(postings_path(output_file),
+                          build_postings(unpack_bits(matrix, total_feats) if packed else matrix, counts))
+        return
+
+    # flat store arrays (compiled store or bulk parse), featurized in one go
+    store = load_graph_store(graphs_file)
+    num = num_graphs(store) if store is not None else 0
+
+    if counts:
+        print(f"Vectorizing {num} graphs (counts of labels, edges, degrees as {count_dtype.__name__})...")
+    else:
+        print(f"Vectorizing {num} graphs (binary presence of labels, edges, degrees)...")
+    if store is None:
+        feat_matrix = vectorize([], schema, counts, count_dtype)
+    else:
+        feat_matrix = store_matrix(store, schema, counts, count_dtype)
+
+    # postings go after the matrix so they are never older than the .npy they index
+    index = build_postings(feat_matrix, counts) if postings else None
+    if packed:
+        feat_matrix = pack_bits(feat_matrix)
     np.save(output_file, feat_matrix)
+    if index is not None:
+        save_postings(postings_path(output_file), index)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
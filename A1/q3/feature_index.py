@@ -0,0 +1,155 @@
+# packed bitset index and posting lists for the histogram prefilter
+import os
+import sys
+import numpy as np
+
+def pack_bits(matrix):
+    # 0/1 feature rows -> uint64 words (64 features per word)
+    matrix = np.asarray(matrix)
+    bits = np.packbits(matrix != 0, axis=1, bitorder='little')
+    pad = (-bits.shape[1]) % 8
+    if pad:
+        bits = np.pad(bits, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(bits).view(np.uint64)
+
+def is_count_matrix(matrix):
+    # convert_to_histogram --counts writes uint8/uint16, presence data is int32 or packed uint64
+    return matrix.dtype in (np.uint8, np.uint16)
+
+def load_packed(npy_path, block_rows=1 << 16):
+    # accepts either the dense .npy from convert_to_histogram or an already packed one.
+    # dense input is read through a memory map and packed a block of rows at a time,
+    # so the full int32 matrix is never held in memory
+    matrix = np.load(npy_path, mmap_mode='r')
+    if matrix.dtype == np.uint64:
+        return np.array(matrix)
+    words = np.empty((matrix.shape[0], (matrix.shape[1] + 63) // 64), dtype=np.uint64)
+    for r in range(0, matrix.shape[0], block_rows):
+        words[r:r + block_rows] = pack_bits(matrix[r:r + block_rows])
+    return words
+
+def contains_mask(q_words, db_words):
+    # db row survives if every bit set in the query is also set in the db row
+    return np.all((q_words & ~db_words) == 0, axis=1)
+
+def dominates_mask(q_counts, db_counts):
+    # counted features: every count in the db row must reach the query's
+    return np.all(q_counts <= db_counts, axis=1)
+
+def batch_candidates(q_words, db_words, counts=False, q_block=64, tile_bytes=1 << 22):
+    # all queries in one sweep: blocks of queries against db tiles sized to stay in cache,
+    # so the db is streamed once per query block instead of once per query
+    num_q, num_db = len(q_words), len(db_words)
+    width = max(1, q_words.shape[1]) * q_words.itemsize
+    tile = max(1, tile_bytes // (q_block * width))
+    hits = [[] for _ in range(num_q)]
+    for q0 in range(0, num_q, q_block):
+        q_blk = q_words[q0:q0 + q_block, None, :]
+        for d0 in range(0, num_db, tile):
+            db_tile = db_words[d0:d0 + tile][None, :, :]
+            if counts:
+                ok = np.all(q_blk <= db_tile, axis=2)
+            else:
+                ok = ~np.any(q_blk & ~db_tile, axis=2)
+            rows, cols = np.nonzero(ok)
+            # nonzero is row-major, so split once per query in the block
+            splits = np.searchsorted(rows, np.arange(1, len(q_blk)))
+            for k, part in enumerate(np.split(cols, splits)):
+                if len(part):
+                    hits[q0 + k].append(part + d0)
+    return [np.concatenate(h) if h else np.zeros(0, dtype=np.int64) for h in hits]
+
+def unpack_bits(words, num_feats):
+    # inverse of pack_bits, trimmed back to the real feature count
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    bits = np.unpackbits(words.view(np.uint8), axis=-1, bitorder='little')
+    return bits[..., :num_feats]
+
+# inverted index: one sorted int32 graph-id list per feature column
+
+def postings_path(npy_path):
+    return os.path.splitext(npy_path)[0] + '_postings.npz'
+
+def build_postings(matrix, counts=False):
+    # counts records which representation the lists were built from, checked again at load
+    matrix = np.asarray(matrix)
+    num_feats = matrix.shape[1]
+    # nonzero on the transpose gives ids grouped by feature, ascending inside each group
+    feats, ids = np.nonzero(matrix.T != 0)
+    sizes = np.bincount(feats, minlength=num_feats)
+    offsets = np.zeros(num_feats + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    return {'offsets': offsets, 'ids': ids.astype(np.int32), 'num_graphs': np.int64(matrix.shape[0]),
+            'counts': np.bool_(counts)}
+
+def save_postings(path, postings):
+    np.savez(path, **postings)
+
+def load_postings(path):
+    data = np.load(path)
+    return {k: data[k] for k in data.files}
+
+def postings_mismatch(path, npy_path, matrix):
+    # why the posting lists at path can't stand in for matrix (loaded from npy_path), or None if they can
+    if os.path.getmtime(path) < os.path.getmtime(npy_path):
+        return f"older than {npy_path}"
+    postings = load_postings(path)
+    num_feats = len(postings['offsets']) - 1
+    if 'counts' not in postings or bool(postings['counts']) != is_count_matrix(matrix):
+        return "built from a different representation (presence vs --counts)"
+    if int(postings['num_graphs']) != matrix.shape[0]:
+        return f"built for {int(postings['num_graphs'])} graphs, matrix has {matrix.shape[0]}"
+    width = (num_feats + 63) // 64 if matrix.dtype == np.uint64 else num_feats
+    if width != matrix.shape[1]:
+        return f"built for {num_feats} features, matrix has {matrix.shape[1]} columns"
+    return None
+
+def select_postings(postings, rows):
+    # posting lists over a subset of the graphs (rows ascending), renumbered 0..len(rows)-1
+    offsets, ids = postings['offsets'], postings['ids']
+    new_id = np.full(int(postings['num_graphs']), -1, dtype=np.int64)
+    new_id[rows] = np.arange(len(rows))
+    feats = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    mapped = new_id[ids]
+    keep = mapped >= 0
+    new_offsets = np.zeros(len(offsets), dtype=np.int64)
+    np.cumsum(np.bincount(feats[keep], minlength=len(offsets) - 1), out=new_offsets[1:])
+    return {'offsets': new_offsets, 'ids': mapped[keep].astype(np.int32), 'num_graphs': np.int64(len(rows)),
+            'counts': postings['counts']}
+
+def candidates_from_postings(postings, q_feats):
+    # intersect the query's posting lists, rarest first, stop as soon as it runs dry
+    offsets, ids = postings['offsets'], postings['ids']
+    feats = np.flatnonzero(q_feats)
+    if len(feats) == 0:
+        return np.arange(int(postings['num_graphs']))
+    sizes = offsets[feats + 1] - offsets[feats]
+    order = feats[np.argsort(sizes, kind='stable')]
+    result = ids[offsets[order[0]]:offsets[order[0] + 1]]
+    for f in order[1:]:
+        if len(result) == 0:
+            break
+        result = np.intersect1d(result, ids[offsets[f]:offsets[f + 1]], assume_unique=True)
+    return result
+
+def main():
+    # build the posting lists for an existing db_vecs.npy (dense or packed)
+    if len(sys.argv) < 2:
+        print("Usage: python feature_index.py <db_npy> [num_feats]")
+        sys.exit(1)
+
+    npy_path = sys.argv[1]
+    matrix = np.load(npy_path)
+    counts = is_count_matrix(matrix)
+    if matrix.dtype == np.uint64:
+        if len(sys.argv) < 3:
+            print("Packed input needs the feature count: python feature_index.py <db_npy> <num_feats>")
+            sys.exit(1)
+        matrix = unpack_bits(matrix, int(sys.argv[2]))
+
+    postings = build_postings(matrix, counts)
+    save_postings(postings_path(npy_path), postings)
+    print(f"Wrote posting lists for {matrix.shape[1]} features ({len(postings['ids'])} entries) to {postings_path(npy_path)}")
+
+if __name__ == "__main__":
+    main()
@@ -39,4 +39,5 @@ fi
 
 echo "Running Two-Stage Filter..."
 # Arguments: <db_vecs> <q_vecs> <db_raw> <q_raw> <output>
-python3 "$SCRIPT_DIR/smart_filter.py" "$DB_FEATS" "$QUERY_FEATS" "$REAL_DB" "$REAL_QUERY" "$OUTPUT_FILE"
\ No newline at end of file
+# extra flags (e.g. --workers N) are passed through
+python3 "$SCRIPT_DIR/smart_filter.py" "$DB_FEATS" "$QUERY_FEATS" "$REAL_DB" "$REAL_QUERY" "$OUTPUT_FILE" "${@:4}"
\ No newline at end of file
@@ -0,0 +1,232 @@
+# compiled CSR-style binary store for a graphs.txt database
+# written once, then every stage loads it with np.load(mmap_mode='r')
+import os
+import re
+import sys
+import json
+import numpy as np
+
+STORE_ARRAYS = ('graph_node_offsets', 'graph_edge_offsets', 'node_ids', 'node_labels',
+                'edge_src', 'edge_dst', 'edge_labels')
+
+def store_path(graphs_file):
+    return graphs_file.rstrip('/') + '.store'
+
+def compile_store(graphs, out_dir):
+    save_store(out_dir, build_store(graphs))
+
+def build_store(graphs):
+    # graphs in the parse_graphs dict form -> flat arrays + label dictionaries
+    node_vocab = sorted({lbl for g in graphs for lbl in g['nodes'].values()})
+    edge_vocab = sorted({lbl for g in graphs for _, _, lbl in g['edges']})
+    node_lbl_id = {lbl: i for i, lbl in enumerate(node_vocab)}
+    edge_lbl_id = {lbl: i for i, lbl in enumerate(edge_vocab)}
+
+    num_nodes = sum(len(g['nodes']) for g in graphs)
+    num_edges = sum(len(g['edges']) for g in graphs)
+    graph_node_offsets = np.zeros(len(graphs) + 1, dtype=np.int64)
+    graph_edge_offsets = np.zeros(len(graphs) + 1, dtype=np.int64)
+    node_ids = np.empty(num_nodes, dtype=np.int32)
+    node_labels = np.empty(num_nodes, dtype=np.int32)
+    edge_src = np.empty(num_edges, dtype=np.int32)
+    edge_dst = np.empty(num_edges, dtype=np.int32)
+    edge_labels = np.empty(num_edges, dtype=np.int32)
+
+    n_pos, e_pos = 0, 0
+    for i, g in enumerate(graphs):
+        # endpoints are stored as positions inside the graph, original ids kept in node_ids
+        local = {}
+        for nid, lbl in g['nodes'].items():
+            local[nid] = n_pos - graph_node_offsets[i]
+            node_ids[n_pos] = nid
+            node_labels[n_pos] = node_lbl_id[lbl]
+            n_pos += 1
+        for src, dst, lbl in g['edges']:
+            edge_src[e_pos] = local[src]
+            edge_dst[e_pos] = local[dst]
+            edge_labels[e_pos] = edge_lbl_id[lbl]
+            e_pos += 1
+        graph_node_offsets[i + 1] = n_pos
+        graph_edge_offsets[i + 1] = e_pos
+
+    return {
+        'graph_node_offsets': graph_node_offsets, 'graph_edge_offsets': graph_edge_offsets,
+        'node_ids': node_ids, 'node_labels': node_labels,
+        'edge_src': edge_src, 'edge_dst': edge_dst, 'edge_labels': edge_labels,
+        'node_vocab': node_vocab, 'edge_vocab': edge_vocab,
+    }
+
+def _tokens_as_ints(arr, starts, lens):
+    # decimal tokens -> int64 without going through Python strings
+    width = int(lens.max()) if len(lens) else 0
+    values = np.zeros(len(starts), dtype=np.int64)
+    for k in range(width):
+        has = lens > k
+        digit = arr[starts[has] + k].astype(np.int64) - 48
+        values[has] = values[has] * 10 + digit
+    return values
+
+def _tokens_as_bytes(arr, starts, lens):
+    # tokens -> fixed-width S array (zero padded) so np.unique can build the vocab
+    width = max(1, int(lens.max()) if len(lens) else 1)
+    mat = np.zeros((len(starts), width), dtype=np.uint8)
+    for k in range(width):
+        has = lens > k
+        mat[has, k] = arr[starts[has] + k]
+    return mat.view(f'S{width}').ravel()
+
+def _file_bytes(filepath, start=0, end=None):
+    if os.path.getsize(filepath):
+        return np.asarray(np.memmap(filepath, dtype=np.uint8, mode='r'))[start:end]
+    return np.zeros(0, np.uint8)
+
+# a header line as fast_parse sees it: first token starts with '#', or is 't' followed by '#...'
+_HEADER_RE = re.compile(rb'^[\x00-\x09\x0b- ]*(?:#|t[\x00-\x09\x0b- ]+#)', re.M)
+
+def count_graphs(filepath, start=0, end=None):
+    # number of graphs in a byte range, without tokenizing it
+    return len(_HEADER_RE.findall(_file_bytes(filepath, start, end)))
+
+def fast_parse(filepath, start=0, end=None):
+    # bulk parser: maps the whole file (or the byte range [start, end), which must
+    # start on a graph header) and tokenizes it with array ops,
+    # producing the store arrays directly (same layout as compile_store)
+    arr = _file_bytes(filepath, start, end)
+    # space, tabs and newlines are all <= 32
+    ws = np.empty(len(arr) + 2, dtype=np.int8)
+    ws[0] = ws[-1] = 1
+    np.less_equal(arr, 32, out=ws[1:-1].view(bool))
+    edges = np.diff(ws)
+    tok_start = np.flatnonzero(edges == -1)
+    tok_len = np.flatnonzero(edges == 1) - tok_start
+
+    # a token opens a line when the whitespace gap before it holds a newline
+    first = np.ones(len(tok_start), dtype=bool)
+    if len(tok_start) > 1:
+        gaps = np.empty(2 * (len(tok_start) - 1), dtype=np.int64)
+        gaps[0::2] = tok_start[:-1] + tok_len[:-1]
+        gaps[1::2] = tok_start[1:]
+        first[1:] = np.maximum.reduceat(arr == 10, gaps)[0::2]
+    line_first = np.flatnonzero(first)
+    line_toks = np.diff(np.append(line_first, len(tok_start)))
+
+    # line kind from its first token: '#...' or 't #' header, 'v...' node, 'e...' edge
+    head_byte = arr[tok_start[line_first]]
+    second = np.minimum(line_first + 1, max(len(tok_start) - 1, 0))
+    t_header = (head_byte == ord('t')) & (tok_len[line_first] == 1) & (line_toks > 1) & \
+               (arr[tok_start[second]] == ord('#'))
+    is_header = (head_byte == ord('#')) | t_header
+    graph_of_line = np.cumsum(is_header) - 1
+    num_graphs = int(is_header.sum())
+    # anything before the first header is ignored, as are short v/e lines
+    in_graph = graph_of_line >= 0
+    v_lines = np.flatnonzero(in_graph & ~is_header & (head_byte == ord('v')) & (line_toks >= 3))
+    e_lines = np.flatnonzero(in_graph & ~is_header & (head_byte == ord('e')) & (line_toks >= 4))
+
+    # token k of a line is simply line_first + k
+    v_tok = line_first[v_lines]
+    node_graph = graph_of_line[v_lines]
+    node_ids = _tokens_as_ints(arr, tok_start[v_tok + 1], tok_len[v_tok + 1])
+    node_vocab_b, node_labels = np.unique(_tokens_as_bytes(arr, tok_start[v_tok + 2], tok_len[v_tok + 2]), return_inverse=True)
+
+    e_tok = line_first[e_lines]
+    edge_graph = graph_of_line[e_lines]
+    src_ids = _tokens_as_ints(arr, tok_start[e_tok + 1], tok_len[e_tok + 1])
+    dst_ids = _tokens_as_ints(arr, tok_start[e_tok + 2], tok_len[e_tok + 2])
+    edge_vocab_b, edge_labels = np.unique(_tokens_as_bytes(arr, tok_start[e_tok + 3], tok_len[e_tok + 3]), return_inverse=True)
+
+    graph_node_offsets = np.zeros(num_graphs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(node_graph, minlength=num_graphs), out=graph_node_offsets[1:])
+    graph_edge_offsets = np.zeros(num_graphs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edge_graph, minlength=num_graphs), out=graph_edge_offsets[1:])
+
+    # endpoint ids -> positions inside their graph, via a sorted (graph, id) key
+    local = np.arange(len(node_ids)) - graph_node_offsets[node_graph]
+    shift = np.int64(int(max(node_ids.max(initial=0), src_ids.max(initial=0), dst_ids.max(initial=0))) + 1)
+    keys = node_graph * shift + node_ids
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    def to_local(ids):
+        return local[order[np.searchsorted(sorted_keys, edge_graph * shift + ids)]]
+
+    return {
+        'graph_node_offsets': graph_node_offsets, 'graph_edge_offsets': graph_edge_offsets,
+        'node_ids': node_ids.astype(np.int32), 'node_labels': node_labels.astype(np.int32),
+        'edge_src': to_local(src_ids).astype(np.int32), 'edge_dst': to_local(dst_ids).astype(np.int32),
+        'edge_labels': edge_labels.astype(np.int32),
+        'node_vocab': [b.decode() for b in node_vocab_b], 'edge_vocab': [b.decode() for b in edge_vocab_b],
+    }
+
+def save_store(out_dir, store):
+    os.makedirs(out_dir, exist_ok=True)
+    for name in STORE_ARRAYS:
+        np.save(os.path.join(out_dir, name + '.npy'), store[name])
+    with open(os.path.join(out_dir, 'labels.json'), 'w') as f:
+        json.dump({'node_labels': list(store['node_vocab']), 'edge_labels': list(store['edge_vocab'])}, f)
+
+def load_store(store_dir):
+    store = {name: np.load(os.path.join(store_dir, name + '.npy'), mmap_mode='r') for name in STORE_ARRAYS}
+    with open(os.path.join(store_dir, 'labels.json'), 'r') as f:
+        labels = json.load(f)
+    store['node_vocab'] = labels['node_labels']
+    store['edge_vocab'] = labels['edge_labels']
+    return store
+
+def is_fresh(store_dir, graphs_file):
+    # a store is only trusted if it was compiled after the text file last changed
+    marker = os.path.join(store_dir, 'labels.json')
+    if not os.path.exists(marker):
+        return False
+    if not os.path.exists(graphs_file):
+        return True
+    return os.path.getmtime(marker) >= os.path.getmtime(graphs_file)
+
+def num_graphs(store):
+    return len(store['graph_node_offsets']) - 1
+
+def slice_store(store, lo, hi):
+    # graphs lo..hi-1 as a store of their own (views into the same arrays, offsets rebased)
+    n_off = np.asarray(store['graph_node_offsets'][lo:hi + 1])
+    e_off = np.asarray(store['graph_edge_offsets'][lo:hi + 1])
+    sub = {'graph_node_offsets': n_off - n_off[0], 'graph_edge_offsets': e_off - e_off[0],
+           'node_vocab': store['node_vocab'], 'edge_vocab': store['edge_vocab']}
+    for name in ('node_ids', 'node_labels'):
+        sub[name] = store[name][n_off[0]:n_off[-1]]
+    for name in ('edge_src', 'edge_dst', 'edge_labels'):
+        sub[name] = store[name][e_off[0]:e_off[-1]]
+    return sub
+
+def store_to_dicts(store):
+    # back to the parse_graphs dict form for code that still wants it
+    return list(iter_store_graphs(store))
+
+def iter_store_graphs(store):
+    # slices the mmapped arrays one graph at a time, so memory stays per-graph
+    node_vocab, edge_vocab = store['node_vocab'], store['edge_vocab']
+    n_off = np.asarray(store['graph_node_offsets']).tolist()
+    e_off = np.asarray(store['graph_edge_offsets']).tolist()
+
+    for i in range(len(n_off) - 1):
+        ids = store['node_ids'][n_off[i]:n_off[i + 1]].tolist()
+        labels = store['node_labels'][n_off[i]:n_off[i + 1]].tolist()
+        src = store['edge_src'][e_off[i]:e_off[i + 1]].tolist()
+        dst = store['edge_dst'][e_off[i]:e_off[i + 1]].tolist()
+        edge_labels = store['edge_labels'][e_off[i]:e_off[i + 1]].tolist()
+        nodes = {nid: node_vocab[lbl] for nid, lbl in zip(ids, labels)}
+        edges = [(ids[a], ids[b], edge_vocab[lbl]) for a, b, lbl in zip(src, dst, edge_labels)]
+        yield {'nodes': nodes, 'edges': edges}
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python graph_store.py <graphs_file> [store_dir]")
+        sys.exit(1)
+
+    graphs_file = sys.argv[1]
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else store_path(graphs_file)
+
+    store = fast_parse(graphs_file)
+    save_store(out_dir, store)
+    print(f"Compiled {num_graphs(store)} graphs into {out_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,163 @@
 # took help of gemini to fix bugs and logic.
+import os
+import numpy as np
 import networkx as nx
+from graph_store import store_path, is_fresh, load_store, store_to_dicts, iter_store_graphs, fast_parse, \
+    num_graphs, slice_store, count_graphs
+
+def split_args(argv, value_opts=()):
+    # pulls --flag / --opt value out of argv, returns (positional, options)
+    positional, opts = [], {}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg.startswith('--'):
+            name = arg[2:]
+            if name in value_opts and i + 1 < len(argv):
+                opts[name] = argv[i + 1]
+                i += 1
+            else:
+                opts[name] = True
+        else:
+            positional.append(arg)
+        i += 1
+    return positional, opts
 
 def parse_graphs(filepath):
-    graphs = []
-    current_graph = None
+    # a compiled store (graph_store.py) is used instead of the text when it is up to date
+    if os.path.isdir(filepath):
+        return store_to_dicts(load_store(filepath))
+    if is_fresh(store_path(filepath), filepath):
+        return store_to_dicts(load_store(store_path(filepath)))
+    if not os.path.exists(filepath):
+        return []
+    # bulk array parser, then the dict form
+    return store_to_dicts(fast_parse(filepath))
+
+def iter_graphs(filepath):
+    # one graph dict at a time, from the compiled store if there is a fresh one
+    if os.path.isdir(filepath):
+        return iter_store_graphs(load_store(filepath))
+    if is_fresh(store_path(filepath), filepath):
+        return iter_store_graphs(load_store(store_path(filepath)))
+    return iter_text_graphs(filepath)
+
+def parse_text_graphs(filepath):
+    return list(iter_text_graphs(filepath))
+
+def iter_text_graphs(filepath, start=0, end=None):
+    # streams graphs from the byte range [start, end); start must sit on a graph header
     try:
-        with open(filepath, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if not line: continue
-                
-                # new graph starts with # or t #
-                if line.startswith('#') or line.startswith('t #'):
-                    if current_graph: graphs.append(current_graph)
-                    current_graph = {'nodes': {}, 'edges': []}
-                
-                elif line.startswith('v'):
-                    parts = line.split()
-                    # format: v id label
-                    current_graph['nodes'][int(parts[1])] = parts[2]
-                
-                elif line.startswith('e'):
-                    parts = line.split()
-                    # format: e src dst label
-                    current_graph['edges'].append((int(parts[1]), int(parts[2]), parts[3]))     
-        
-        if current_graph: graphs.append(current_graph)
+        f = open(filepath, 'rb')
     except FileNotFoundError:
+        return
+    with f:
+        f.seek(start)
+        yield from iter_graph_lines(_decoded_lines(f, start, end))
+
+def _decoded_lines(f, pos, end):
+    for raw in f:
+        if end is not None and pos >= end:
+            break
+        pos += len(raw)
+        yield raw.decode()
+
+def iter_graph_lines(lines):
+    # the text format itself, for any iterable of lines (file, socket, stdin)
+    current_graph = None
+    for line in lines:
+        line = line.strip()
+        if not line: continue
+
+        # new graph starts with # or t #
+        if line.startswith('#') or line.startswith('t #'):
+            if current_graph: yield current_graph
+            current_graph = {'nodes': {}, 'edges': []}
+
+        elif line.startswith('v'):
+            parts = line.split()
+            # format: v id label
+            current_graph['nodes'][int(parts[1])] = parts[2]
+
+        elif line.startswith('e'):
+            parts = line.split()
+            # format: e src dst label
+            current_graph['edges'].append((int(parts[1]), int(parts[2]), parts[3]))
+
+    if current_graph: yield current_graph
+
+def split_graph_file(filepath, num_chunks):
+    # byte ranges of roughly equal size, each starting on a graph header line
+    size = os.path.getsize(filepath)
+    bounds = [0]
+    with open(filepath, 'rb') as f:
+        for k in range(1, num_chunks):
+            f.seek(max(size * k // num_chunks, bounds[-1]))
+            if f.tell() > 0:
+                f.readline()  # skip the partial line we landed in
+            while True:
+                pos = f.tell()
+                raw = f.readline()
+                if not raw:
+                    pos = size
+                    break
+                if raw.lstrip().startswith(b'#') or raw.lstrip().startswith(b't #'):
+                    break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1) if bounds[i + 1] > bounds[i]]
+
+def graph_chunks(filepath, num_chunks):
+    # work split for the parallel passes: graph index ranges over a fresh store,
+    # otherwise byte ranges of the text that each start on a graph header
+    store_dir = filepath if os.path.isdir(filepath) else store_path(filepath)
+    if os.path.isdir(filepath) or is_fresh(store_dir, filepath):
+        bounds = np.linspace(0, num_graphs(load_store(store_dir)), num_chunks + 1).astype(int).tolist()
+        return [('graphs', bounds[i], bounds[i + 1]) for i in range(num_chunks) if bounds[i + 1] > bounds[i]]
+    if not os.path.exists(filepath):
         return []
-    return graphs
+    return [('bytes', start, end) for start, end in split_graph_file(filepath, num_chunks)]
+
+def chunk_num_graphs(filepath, chunk):
+    kind, a, b = chunk
+    return b - a if kind == 'graphs' else count_graphs(filepath, a, b)
+
+def load_chunk_store(filepath, chunk):
+    # store arrays for one chunk from graph_chunks
+    kind, a, b = chunk
+    if kind == 'graphs':
+        return slice_store(load_graph_store(filepath), a, b)
+    return fast_parse(filepath, a, b)
+
+def labeled_paths(g_dict, max_len, min_len=2):
+    # counts of simple labeled paths with min_len..max_len edges, keyed by the
+    # canonical (label, edge label, label, ...) tuple (smaller of the two directions)
+    node_labels = g_dict['nodes']
+    adj = {nid: {} for nid in node_labels}
+    for src, dst, lbl in g_dict['edges']:
+        if src != dst:
+            adj[src][dst] = lbl
+            adj[dst][src] = lbl
+
+    counts = {}
+    def walk(path, seq):
+        if len(path) - 1 >= min_len:
+            rev = seq[::-1]
+            key = seq if seq <= rev else rev
+            counts[key] = counts.get(key, 0) + 1
+        if len(path) - 1 == max_len:
+            return
+        for nbr, lbl in adj[path[-1]].items():
+            if nbr not in path:
+                path.append(nbr)
+                walk(path, seq + (lbl, node_labels[nbr]))
+                path.pop()
+
+    for nid in node_labels:
+        walk([nid], (node_labels[nid],))
+    # every undirected path was walked once from each end
+    return {key: c // 2 for key, c in counts.items()}
 
 def to_networkx(g_dict):
     G = nx.Graph()
@@ -38,47 +167,173 @@ def to_networkx(g_dict):
         G.add_edge(src, dst, label=label)
     return G
 
-def check_neighborhood_consistency(G_db, G_query):
-    # grab labels and neighbor labels for db nodes
-    db_signatures = []
-    for n in G_db.nodes():
-        lbl = G_db.nodes[n]['label']
-        nbr_labels = sorted([G_db.nodes[nbr]['label'] for nbr in G_db.neighbors(n)])
-        db_signatures.append((lbl, nbr_labels))
-        
-    # check each node in query against db signatures
-    for u in G_query.nodes():
-        q_lbl = G_query.nodes[u]['label']
-        q_nbr_labels = sorted([G_query.nodes[nbr]['label'] for nbr in G_query.neighbors(u)])
-        
-        found_match = False
-        for db_lbl, db_nbr_labels in db_signatures:
-            if db_lbl != q_lbl: 
-                continue
-            
-            # pointer-based subset check for the sorted lists
-            i, j = 0, 0
-            subset = True
-            while i < len(q_nbr_labels):
-                if j >= len(db_nbr_labels):
-                    subset = False
+class CompactGraph:
+    # array-backed graph for the filter cascade: int label ids + CSR adjacency.
+    # neighbors/edge counts follow nx.Graph semantics (duplicate edges collapse, last label wins)
+    __slots__ = ('node_ids', 'labels', 'indptr', 'indices', 'adj_labels', 'num_edges')
+
+    def __init__(self, node_ids, labels, src, dst, edge_labels):
+        n = len(labels)
+        self.node_ids = np.asarray(node_ids, dtype=np.int32)
+        self.labels = np.asarray(labels, dtype=np.int32)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        edge_labels = np.asarray(edge_labels, dtype=np.int32)
+
+        lo, hi = np.minimum(src, dst), np.maximum(src, dst)
+        if len(lo):
+            # keep the last occurrence of every undirected pair
+            _, first_rev = np.unique((lo * n + hi)[::-1], return_index=True)
+            keep = np.sort(len(lo) - 1 - first_rev)
+            lo, hi, edge_labels = lo[keep], hi[keep], edge_labels[keep]
+        self.num_edges = len(lo)
+
+        # both directions, self loops only once
+        loop = lo == hi
+        rows = np.concatenate([lo, hi[~loop]])
+        cols = np.concatenate([hi, lo[~loop]])
+        labs = np.concatenate([edge_labels, edge_labels[~loop]])
+        order = np.argsort(rows, kind='stable')
+        self.indices = cols[order].astype(np.int32)
+        self.adj_labels = labs[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(np.bincount(rows, minlength=n), out=self.indptr[1:])
+
+    def number_of_nodes(self):
+        return len(self.labels)
+
+    def number_of_edges(self):
+        return self.num_edges
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def edge_labels(self):
+        # label of every undirected edge, once each
+        rows = np.repeat(np.arange(len(self.labels), dtype=np.int32), np.diff(self.indptr))
+        return self.adj_labels[self.indices >= rows]
+
+    def to_networkx(self, node_vocab=None, edge_vocab=None):
+        # only built when something actually needs networkx; vocab lists map ids back to strings
+        G = nx.Graph()
+        ids = self.node_ids.tolist()
+        for i, lbl in enumerate(self.labels.tolist()):
+            G.add_node(ids[i], label=node_vocab[lbl] if node_vocab is not None else lbl)
+        indptr, indices, adj_labels = self.indptr.tolist(), self.indices.tolist(), self.adj_labels.tolist()
+        for i in range(len(ids)):
+            for k in range(indptr[i], indptr[i + 1]):
+                j = indices[k]
+                if j >= i:
+                    lbl = adj_labels[k]
+                    G.add_edge(ids[i], ids[j], label=edge_vocab[lbl] if edge_vocab is not None else lbl)
+        return G
+
+def _label_ids(vocab, labels):
+    # string labels -> ids in a vocab dict shared by db and queries (new labels get appended)
+    return np.array([vocab.setdefault(lbl, len(vocab)) for lbl in labels], dtype=np.int32)
+
+def load_graph_store(filepath):
+    # store arrays for a db: the compiled store if fresh, else a bulk parse of the text (None if missing)
+    store_dir = filepath if os.path.isdir(filepath) else store_path(filepath)
+    if os.path.isdir(filepath) or is_fresh(store_dir, filepath):
+        return load_store(store_dir)
+    if os.path.exists(filepath):
+        return fast_parse(filepath)
+    return None
+
+def load_compact_graphs(filepath, node_vocab, edge_vocab):
+    # straight from the store arrays (compiled, or parsed in bulk), skipping the dict form
+    store = load_graph_store(filepath)
+    if store is None:
+        return []
+    node_remap = _label_ids(node_vocab, store['node_vocab'])
+    edge_remap = _label_ids(edge_vocab, store['edge_vocab'])
+    n_off = np.asarray(store['graph_node_offsets'])
+    e_off = np.asarray(store['graph_edge_offsets'])
+    node_ids, node_labels = store['node_ids'], node_remap[store['node_labels']]
+    src, dst, edge_labels = store['edge_src'], store['edge_dst'], edge_remap[store['edge_labels']]
+    return [CompactGraph(node_ids[n_off[i]:n_off[i + 1]], node_labels[n_off[i]:n_off[i + 1]],
+                         src[e_off[i]:e_off[i + 1]], dst[e_off[i]:e_off[i + 1]],
+                         edge_labels[e_off[i]:e_off[i + 1]])
+            for i in range(len(n_off) - 1)]
+
+def compact_from_dict(g, node_vocab, edge_vocab):
+    ids = list(g['nodes'])
+    local = {nid: k for k, nid in enumerate(ids)}
+    return CompactGraph(ids, _label_ids(node_vocab, g['nodes'].values()),
+                        [local[s] for s, _, _ in g['edges']],
+                        [local[d] for _, d, _ in g['edges']],
+                        _label_ids(edge_vocab, [l for _, _, l in g['edges']]))
+
+def _dominates(db_counts, q_counts):
+    # multiset inclusion, bails on the first label the db side is short of
+    for lbl, c in q_counts.items():
+        if db_counts.get(lbl, 0) < c:
+            return False
+    return True
+
+def neighborhood_signatures(G):
+    # center label -> [(degree, {neighbor label: count})], built once per graph
+    if isinstance(G, CompactGraph):
+        return _compact_signatures(G)
+    by_label = {}
+    for n in G.nodes():
+        counts = {}
+        for nbr in G.neighbors(n):
+            nbr_lbl = G.nodes[nbr]['label']
+            counts[nbr_lbl] = counts.get(nbr_lbl, 0) + 1
+        by_label.setdefault(G.nodes[n]['label'], set()).add(tuple(sorted(counts.items())))
+
+    return _reduce_signatures(by_label)
+
+def _compact_signatures(G):
+    labels, indptr, indices = G.labels.tolist(), G.indptr.tolist(), G.indices.tolist()
+    by_label = {}
+    for n, lbl in enumerate(labels):
+        counts = {}
+        for k in range(indptr[n], indptr[n + 1]):
+            nbr_lbl = labels[indices[k]]
+            counts[nbr_lbl] = counts.get(nbr_lbl, 0) + 1
+        by_label.setdefault(lbl, set()).add(tuple(sorted(counts.items())))
+    return _reduce_signatures(by_label)
+
+def _reduce_signatures(by_label):
+    sigs = {}
+    for lbl, uniq in by_label.items():
+        # biggest first, and drop signatures another one of the same label already covers
+        cands = sorted(((sum(c for _, c in t), dict(t)) for t in uniq), key=lambda x: -x[0])
+        kept = []
+        for deg, counts in cands:
+            if not any(k_deg >= deg and _dominates(k_counts, counts) for k_deg, k_counts in kept):
+                kept.append((deg, counts))
+        sigs[lbl] = kept
+    return sigs
+
+def check_neighborhood_consistency(G_db, G_query, db_sigs=None, q_sigs=None):
+    # signatures can be passed in so the db side is computed once, not per query
+    if db_sigs is None:
+        db_sigs = neighborhood_signatures(G_db)
+    if q_sigs is None:
+        q_sigs = neighborhood_signatures(G_query)
+
+    # every query node needs some db node with the same label whose neighbor labels cover it
+    for q_lbl, q_list in q_sigs.items():
+        db_list = db_sigs.get(q_lbl)
+        if not db_list:
+            return False
+        for q_deg, q_counts in q_list:
+            found_match = False
+            for db_deg, db_counts in db_list:
+                # sorted by degree, nothing further down can cover this one
+                if db_deg < q_deg:
                     break
-                
-                if q_nbr_labels[i] == db_nbr_labels[j]:
-                    i += 1
-                    j += 1
-                elif q_nbr_labels[i] > db_nbr_labels[j]:
-                    j += 1
-                else:
-                    subset = False
+                if _dominates(db_counts, q_counts):
+                    found_match = True
                     break
-            
-            if subset:
-                found_match = True
-                break
-        
-        # no match found for this node
-        if not found_match:
-            return False 
-            
-    return True
\ No newline at end of file
+            if not found_match:
+                return False
+
+    return True
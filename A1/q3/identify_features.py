@@ -1,71 +1,179 @@
 # took help of gemini to fix bugs and logic.
 import sys
 import json
-from graph_utils import parse_graphs
+import multiprocessing as mp
+from graph_store import iter_store_graphs
+from graph_utils import parse_graphs, iter_graphs, iter_text_graphs, graph_chunks, load_chunk_store, labeled_paths, split_args
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python identify_features.py <graphs_file> <output_schema_json>")
-        sys.exit(1)
+def _subpaths(seq):
+    # every shorter contiguous subpath (>= 1 edge) in canonical direction
+    k = len(seq) // 2
+    for i in range(k):
+        for j in range(i + 1, k + 1):
+            if j - i == k:
+                continue
+            sub = seq[2 * i:2 * j + 1]
+            rev = sub[::-1]
+            yield sub if sub <= rev else rev
+
+def mine_paths(graphs, max_len, min_count, max_paths, gamma, label_support, edge_support):
+    # gIndex-style: shorter paths first, a path is kept only if the graphs already
+    # implied by its selected subfeatures are at least gamma times the graphs that contain it
+    path_support = {}
+    for gid, g in enumerate(graphs):
+        for key in labeled_paths(g, max_len):
+            path_support.setdefault(key, set()).add(gid)
 
-    graphs_file = sys.argv[1]
-    output_file = sys.argv[2]
+    all_graphs = set(range(len(graphs)))
+    selected = dict(edge_support)
+    chosen = []
+    for length in range(2, max_len + 1):
+        scored = []
+        for key, support in path_support.items():
+            if len(key) != 2 * length + 1 or len(support) < max(min_count, 1):
+                continue
+            covering = all_graphs
+            for lbl in set(key[0::2]):
+                covering = covering & label_support[lbl]
+            for sub in _subpaths(key):
+                if sub in selected:
+                    covering = covering & selected[sub]
+            ratio = len(covering) / len(support)
+            if ratio >= gamma:
+                scored.append((ratio, len(support), key))
 
-    print(f"Mining frequent edge subgraphs from {graphs_file} with minsup=0.10...")
-    graphs = parse_graphs(graphs_file)
-    total_graphs = len(graphs)
+        scored.sort(key=lambda x: (-x[0], -x[1], x[2]))
+        for ratio, _, key in scored[:max_paths - len(chosen)]:
+            selected[key] = path_support[key]
+            chosen.append(key)
+        if len(chosen) >= max_paths:
+            break
+    return chosen
 
-    # find frequent edges (2-node subgraphs)
+def scan_graphs(graphs):
+    # one pass: per-graph edge pattern support, node labels and max degree
     edge_pattern_counts = {}
+    unique_node_labels = set()
+    max_degree = 0
+    total_graphs = 0
     for g in graphs:
+        total_graphs += 1
         seen_edges = set()
         node_labels = g['nodes']
+        degrees = {}
         for src, dst, edge_lbl in g['edges']:
             src_lbl = node_labels[src]
             dst_lbl = node_labels[dst]
-            
+
             # keep order consistent for undirected edges
             if src_lbl > dst_lbl:
                 pattern = (dst_lbl, edge_lbl, src_lbl)
             else:
                 pattern = (src_lbl, edge_lbl, dst_lbl)
             seen_edges.add(pattern)
-        
+
+            degrees[src] = degrees.get(src, 0) + 1
+            degrees[dst] = degrees.get(dst, 0) + 1
+
         for pattern in seen_edges:
             edge_pattern_counts[pattern] = edge_pattern_counts.get(pattern, 0) + 1
+        unique_node_labels.update(node_labels.values())
+        if degrees:
+            max_degree = max(max_degree, max(degrees.values()))
+    return edge_pattern_counts, unique_node_labels, max_degree, total_graphs
+
+def scan_chunk(task):
+    filepath, chunk = task
+    kind, start, end = chunk
+    if kind == 'bytes':
+        return scan_graphs(iter_text_graphs(filepath, start, end))
+    return scan_graphs(iter_store_graphs(load_chunk_store(filepath, chunk)))
 
+def merge_scans(scans):
+    # chunks merged in file order so tie order matches a sequential pass
+    edge_pattern_counts, unique_node_labels, max_degree, total_graphs = {}, set(), 0, 0
+    for counts, labels, deg, n in scans:
+        for pattern, c in counts.items():
+            edge_pattern_counts[pattern] = edge_pattern_counts.get(pattern, 0) + c
+        unique_node_labels |= labels
+        max_degree = max(max_degree, deg)
+        total_graphs += n
+    return edge_pattern_counts, unique_node_labels, max_degree, total_graphs
+
+MINSUP = 0.10
+SCHEMA_VERSION = 1
+
+def build_schema(edge_pattern_counts, unique_node_labels, max_degree, total_graphs, version=SCHEMA_VERSION):
     # check against 10% minsup
-    minsup = 0.10
-    min_count = int(minsup * total_graphs)
+    min_count = int(MINSUP * total_graphs)
     frequent_patterns = {pat: count for pat, count in edge_pattern_counts.items() if count >= min_count}
 
     # grab top 50 most frequent
     sorted_patterns = sorted(frequent_patterns.items(), key=lambda x: x[1], reverse=True)[:50]
     top_patterns = [pat for pat, _ in sorted_patterns]
 
-    # get all unique node labels
-    unique_node_labels = set()
-    for g in graphs:
-        for lbl in g['nodes'].values():
-            unique_node_labels.add(lbl)
-
     schema = {
         "node_labels": sorted(list(unique_node_labels)),
         "frequent_edge_patterns": top_patterns,
-        "max_degree": 0
+        "max_degree": max_degree,
+        # bumped on every re-identification so appended segments can tell which schema they match
+        "version": version
     }
+    return schema, min_count
 
-    # track the max degree found across all graphs
-    max_degree = 0
-    for g in graphs:
-        degrees = {}
-        for src, dst, _ in g['edges']:
-            degrees[src] = degrees.get(src, 0) + 1
-            degrees[dst] = degrees.get(dst, 0) + 1
-        if degrees:
-            current_max = max(degrees.values())
-            max_degree = max(max_degree, current_max)
-    schema["max_degree"] = max_degree
+def add_paths(schema, graphs, min_count, max_path_len, max_paths, gamma):
+    # mined path columns (--paths) on top of the edge-pattern schema; the settings are kept
+    # in the schema so a re-identification (append_db.py) mines them the same way
+    label_support, edge_support = {}, {}
+    top_set = {tuple(p) for p in schema["frequent_edge_patterns"]}
+    for gid, g in enumerate(graphs):
+        for lbl in g['nodes'].values():
+            label_support.setdefault(lbl, set()).add(gid)
+        for src, dst, edge_lbl in g['edges']:
+            src_lbl, dst_lbl = g['nodes'][src], g['nodes'][dst]
+            pattern = (dst_lbl, edge_lbl, src_lbl) if src_lbl > dst_lbl else (src_lbl, edge_lbl, dst_lbl)
+            if pattern in top_set:
+                edge_support.setdefault(pattern, set()).add(gid)
+    schema["paths"] = mine_paths(graphs, max_path_len, min_count, max_paths, gamma, label_support, edge_support)
+    schema["path_settings"] = {"max_len": max_path_len, "max_paths": max_paths, "gamma": gamma}
+
+def main():
+    args, opts = split_args(sys.argv[1:], value_opts=('paths', 'max-paths', 'gamma', 'workers'))
+    if len(args) < 2:
+        print("Usage: python identify_features.py <graphs_file> <output_schema_json>"
+              " [--workers N] [--paths K [--max-paths N] [--gamma G]]")
+        sys.exit(1)
+
+    graphs_file = args[0]
+    output_file = args[1]
+    # --paths K also mines discriminative labeled paths of 2..K edges
+    max_path_len = int(opts.get('paths', 0))
+    workers = int(opts.get('workers', 1))
+
+    print(f"Mining frequent edge subgraphs from {graphs_file} with minsup={MINSUP:.2f}...")
+    graphs = None
+    if max_path_len >= 2:
+        # path mining needs the graphs again afterwards, keep them around
+        graphs = parse_graphs(graphs_file)
+        stats = scan_graphs(graphs)
+    elif workers > 1:
+        # text chunks split on graph headers (or graph ranges of a fresh store),
+        # counters summed and degree maxima maxed afterwards
+        tasks = [(graphs_file, chunk) for chunk in graph_chunks(graphs_file, workers)]
+        with mp.Pool(workers) as pool:
+            stats = merge_scans(pool.map(scan_chunk, tasks))
+    else:
+        # streamed, only the counters are kept in memory
+        stats = scan_graphs(iter_graphs(graphs_file))
+    edge_pattern_counts, unique_node_labels, max_degree, total_graphs = stats
+
+    schema, min_count = build_schema(edge_pattern_counts, unique_node_labels, max_degree, total_graphs)
+    top_patterns = schema["frequent_edge_patterns"]
+    minsup = MINSUP
+
+    if max_path_len >= 2:
+        add_paths(schema, graphs, min_count, max_path_len, int(opts.get('max-paths', 50)), float(opts.get('gamma', 2.0)))
+        print(f"Selected {len(schema['paths'])} discriminative paths (length <= {max_path_len})")
 
     print(f"Found {len(top_patterns)} frequent edge patterns (minsup={minsup}), {len(schema['node_labels'])} labels, Max Degree: {max_degree}")
     
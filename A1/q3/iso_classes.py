@@ -0,0 +1,80 @@
+# isomorphic-duplicate classes of the database graphs, written next to db_vecs.npy
+# as <db_vecs>_classes.npz. smart_filter filters one representative per class and
+# expands the answers back to every member.
+# Usage: python iso_classes.py <db_npy> <db_graphs> [--workers N] [--iso-timeout S]
+import os
+import sys
+import multiprocessing as mp
+import numpy as np
+from graph_utils import split_args
+from append_db import load_db_graphs, db_fingerprint
+from query_cache import graph_key, isomorphic
+
+def classes_path(db_vec_path):
+    return os.path.splitext(db_vec_path)[0] + '_classes.npz'
+
+_GRAPHS = {}
+
+def _key_of(idx):
+    return graph_key(_GRAPHS['graphs'][idx], _GRAPHS['node_vocab'], _GRAPHS['edge_vocab'])
+
+def build_classes(graphs, node_vocab, edge_vocab, workers=1, timeout=1.0):
+    # WL hash buckets, split further by an exact isomorphism check against each class's first member.
+    # a check that runs past timeout seconds keeps the graphs apart (a class too many is still correct).
+    # class ids follow the first member's position, so reps come out sorted
+    _GRAPHS.update(graphs=graphs, node_vocab=list(node_vocab), edge_vocab=list(edge_vocab))
+    if workers > 1:
+        with mp.get_context('fork').Pool(workers) as pool:
+            keys = pool.map(_key_of, range(len(graphs)), chunksize=max(1, len(graphs) // (workers * 8)))
+    else:
+        keys = [_key_of(i) for i in range(len(graphs))]
+    _GRAPHS.clear()
+
+    class_of = np.empty(len(graphs), dtype=np.int32)
+    reps = []
+    buckets = {}  # WL hash -> [(form, class id)]
+    for idx, (h, form) in enumerate(keys):
+        bucket = buckets.setdefault(h, [])
+        for rep_form, cls in bucket:
+            if isomorphic(form, rep_form, timeout):
+                class_of[idx] = cls
+                break
+        else:
+            class_of[idx] = len(reps)
+            bucket.append((form, len(reps)))
+            reps.append(idx)
+    return {'class_of': class_of, 'reps': np.array(reps, dtype=np.int32), 'num_graphs': np.int64(len(graphs))}
+
+def save_classes(path, classes):
+    np.savez(path, **classes)
+
+def load_classes(path):
+    data = np.load(path)
+    return {k: data[k] for k in data.files}
+
+def class_members(classes):
+    # 1-indexed member ids per class, ascending
+    order = np.argsort(classes['class_of'], kind='stable')
+    bounds = np.searchsorted(classes['class_of'][order], np.arange(len(classes['reps']) + 1))
+    ids = (order + 1).tolist()
+    return [ids[bounds[c]:bounds[c + 1]] for c in range(len(classes['reps']))]
+
+def main():
+    args, opts = split_args(sys.argv[1:], value_opts=('workers', 'iso-timeout'))
+    if len(args) < 2:
+        print("Usage: python iso_classes.py <db_npy> <db_graphs> [--workers N] [--iso-timeout S]")
+        sys.exit(1)
+
+    db_vec_path, db_graph_path = args[0], args[1]
+    node_vocab, edge_vocab = {}, {}
+    # base graphs plus the segments appended with append_db.py, like smart_filter loads them
+    graphs = load_db_graphs(db_vec_path, db_graph_path, node_vocab, edge_vocab)
+    classes = build_classes(graphs, node_vocab, edge_vocab, int(opts.get('workers', 1)),
+                            float(opts.get('iso-timeout', 1.0)))
+    # smart_filter only trusts the classes while the db files are unchanged
+    classes['fingerprint'] = np.str_(db_fingerprint(db_vec_path, db_graph_path))
+    save_classes(classes_path(db_vec_path), classes)
+    print(f"{len(graphs)} graphs -> {len(classes['reps'])} isomorphism classes, saved to {classes_path(db_vec_path)}")
+
+if __name__ == "__main__":
+    main()
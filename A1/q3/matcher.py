@@ -0,0 +1,115 @@
+# exact label-aware subgraph matcher (non-induced, edge labels must agree) on CompactGraph.
+# VF2++-style ordering: rarest label in the target first, then most-connected to what is already ordered
+import time
+
+class MatchTimeout(Exception):
+    pass
+
+def _adjacency(G):
+    # node -> {neighbor: edge label}
+    indptr, indices, adj_labels = G.indptr.tolist(), G.indices.tolist(), G.adj_labels.tolist()
+    return [dict(zip(indices[indptr[i]:indptr[i + 1]], adj_labels[indptr[i]:indptr[i + 1]]))
+            for i in range(len(indptr) - 1)]
+
+def _nbr_label_counts(labels, adj):
+    out = []
+    for nbrs in adj:
+        counts = {}
+        for j in nbrs:
+            counts[labels[j]] = counts.get(labels[j], 0) + 1
+        out.append(counts)
+    return out
+
+def matching_order(q_labels, q_adj, label_freq):
+    order, placed = [], set()
+    remaining = set(range(len(q_labels)))
+    while remaining:
+        # connections to the placed nodes first, then rarest label in the target, then degree
+        u = max(remaining, key=lambda n: (sum(1 for m in q_adj[n] if m in placed),
+                                          -label_freq.get(q_labels[n], 0), len(q_adj[n])))
+        order.append(u)
+        placed.add(u)
+        remaining.discard(u)
+    return order
+
+def subgraph_match(Q, G, timeout=None):
+    # True if Q maps injectively into G keeping node labels, edges and edge labels.
+    # None if the timeout (seconds) ran out before an answer
+    q_labels, g_labels = Q.labels.tolist(), G.labels.tolist()
+    if len(q_labels) > len(g_labels) or Q.number_of_edges() > G.number_of_edges():
+        return False
+    q_adj, g_adj = _adjacency(Q), _adjacency(G)
+
+    label_freq = {}
+    by_label = {}
+    for v, lbl in enumerate(g_labels):
+        label_freq[lbl] = label_freq.get(lbl, 0) + 1
+        by_label.setdefault(lbl, []).append(v)
+    q_freq = {}
+    for lbl in q_labels:
+        q_freq[lbl] = q_freq.get(lbl, 0) + 1
+    for lbl, c in q_freq.items():
+        if label_freq.get(lbl, 0) < c:
+            return False
+
+    q_counts, g_counts = _nbr_label_counts(q_labels, q_adj), _nbr_label_counts(g_labels, g_adj)
+
+    def feasible_node(u, v):
+        if g_labels[v] != q_labels[u] or len(g_adj[v]) < len(q_adj[u]):
+            return False
+        gc = g_counts[v]
+        for lbl, c in q_counts[u].items():
+            if gc.get(lbl, 0) < c:
+                return False
+        return True
+
+    # static per-node candidate lists, pruned by label, degree and neighborhood
+    domains = []
+    for u in range(len(q_labels)):
+        dom = [v for v in by_label.get(q_labels[u], []) if feasible_node(u, v)]
+        if not dom:
+            return False
+        domains.append(set(dom))
+
+    order = matching_order(q_labels, q_adj, label_freq)
+    pos = {u: k for k, u in enumerate(order)}
+    # for each position: the earlier query neighbors and their edge labels
+    back_edges = [[(w, lbl) for w, lbl in q_adj[u].items() if pos[w] < pos[u]] for u in order]
+
+    deadline = time.perf_counter() + timeout if timeout is not None else None
+    mapping = {}
+    used = set()
+    steps = [0]
+
+    def extend(k):
+        if k == len(order):
+            return True
+        steps[0] += 1
+        if deadline is not None and steps[0] % 256 == 0 and time.perf_counter() > deadline:
+            raise MatchTimeout()
+        u = order[k]
+        back = back_edges[k]
+        if back:
+            # only neighbors of an already mapped query neighbor can work
+            w0, _ = back[0]
+            cands = [v for v in g_adj[mapping[w0]] if v in domains[u]]
+        else:
+            cands = domains[u]
+        for v in cands:
+            if v in used:
+                continue
+            adj_v = g_adj[v]
+            if any(adj_v.get(mapping[w], -1) != lbl for w, lbl in back):
+                continue
+            mapping[u] = v
+            used.add(v)
+            if extend(k + 1):
+                return True
+            used.discard(v)
+            del mapping[u]
+        return False
+
+    try:
+        return extend(0)
+    except MatchTimeout:
+        return None
@@ -0,0 +1,80 @@
+# per-query stage metrics for the filter cascade, plus optional timing hooks
+# around hot functions and a cProfile wrapper
+import os
+import csv
+import json
+import time
+import cProfile
+import pstats
+import functools
+
+# function name -> [calls, seconds]; reset per query by take_hook_totals()
+_HOOK_TOTALS = {}
+
+def install_hooks(module, names):
+    # swaps module-level functions for perf_counter-timed wrappers
+    for name in names:
+        fn = getattr(module, name)
+
+        @functools.wraps(fn)
+        def timed(*args, _fn=fn, _name=name, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _fn(*args, **kwargs)
+            finally:
+                slot = _HOOK_TOTALS.setdefault(_name, [0, 0.0])
+                slot[0] += 1
+                slot[1] += time.perf_counter() - start
+        setattr(module, name, timed)
+
+def take_hook_totals():
+    totals = {name: {'calls': c, 'ms': s * 1000} for name, (c, s) in _HOOK_TOTALS.items()}
+    _HOOK_TOTALS.clear()
+    return totals
+
+def summarize(records):
+    # totals per stage over all queries; prune rate = share of the stage's input it removed
+    summary = {}
+    for rec in records:
+        for name, seconds, n_in, n_out in rec['stages']:
+            s = summary.setdefault(name, {'ms': 0.0, 'in': 0, 'out': 0})
+            s['ms'] += seconds * 1000
+            s['in'] += n_in
+            s['out'] += n_out
+    for s in summary.values():
+        s['prune_rate'] = 1 - s['out'] / s['in'] if s['in'] else 0.0
+    return summary
+
+def write_metrics(path, records):
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['query', 'stage', 'ms', 'in', 'out'])
+            for rec in records:
+                for name, seconds, n_in, n_out in rec['stages']:
+                    writer.writerow([rec['query'], name, f"{seconds * 1000:.4f}", n_in, n_out])
+                for name, h in rec.get('hooks', {}).items():
+                    writer.writerow([rec['query'], 'hook:' + name, f"{h['ms']:.4f}", h['calls'], ''])
+        return
+
+    out = {'summary': summarize(records), 'queries': [
+        {'query': rec['query'],
+         'stages': [{'stage': name, 'ms': seconds * 1000, 'in': n_in, 'out': n_out}
+                    for name, seconds, n_in, n_out in rec['stages']],
+         'hooks': rec.get('hooks', {})}
+        for rec in records]}
+    with open(path, 'w') as f:
+        json.dump(out, f, indent=1)
+
+def print_summary(records):
+    for name, s in summarize(records).items():
+        print(f"  {name:14s} {s['ms']:10.1f} ms  {s['in']:>10d} -> {s['out']:<10d} pruned {s['prune_rate'] * 100:5.1f}%")
+
+def run_profiled(fn, path):
+    # cProfile around the whole run (parent process only), stats dumped to path
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(fn)
+    finally:
+        profiler.dump_stats(path)
+        pstats.Stats(path).sort_stats('cumulative').print_stats(15)
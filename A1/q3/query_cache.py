@@ -0,0 +1,108 @@
+# result cache for repeated / isomorphic queries: keyed by a Weisfeiler-Lehman hash
+# over node and edge labels, collisions settled by an exact isomorphism check
+import os
+import pickle
+import hashlib
+from collections import OrderedDict
+from graph_utils import CompactGraph
+from matcher import subgraph_match
+
+def _digest(text):
+    # stable across processes, unlike hash()
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+def wl_hash(labels, adj, iterations=3):
+    # labels: node label strings, adj: per node list of (neighbor, edge label string)
+    colors = [_digest(lbl) for lbl in labels]
+    for _ in range(iterations):
+        colors = [_digest(colors[i] + '|' + ','.join(sorted(f"{e}:{colors[j]}" for j, e in adj[i])))
+                  for i in range(len(labels))]
+    summary = ','.join(sorted(colors))
+    return _digest(f"{len(labels)}|{summary}")
+
+def graph_key(G, node_vocab, edge_vocab):
+    # CompactGraph -> (WL hash, label-string form kept for collision checks / persistence)
+    labels = [node_vocab[l] for l in G.labels.tolist()]
+    indptr, indices, adj_labels = G.indptr.tolist(), G.indices.tolist(), G.adj_labels.tolist()
+    adj = [[(indices[k], edge_vocab[adj_labels[k]]) for k in range(indptr[i], indptr[i + 1])]
+           for i in range(len(labels))]
+    edges = [(i, j, e) for i in range(len(labels)) for j, e in adj[i] if j >= i]
+    return wl_hash(labels, adj), (labels, edges)
+
+def _to_compact(form, node_ids, edge_ids):
+    labels, edges = form
+    return CompactGraph(range(len(labels)), [node_ids.setdefault(l, len(node_ids)) for l in labels],
+                        [i for i, _, _ in edges], [j for _, j, _ in edges],
+                        [edge_ids.setdefault(e, len(edge_ids)) for _, _, e in edges])
+
+def isomorphic(form_a, form_b, timeout=None):
+    # a match that runs out of time counts as not isomorphic
+    if len(form_a[0]) != len(form_b[0]) or len(form_a[1]) != len(form_b[1]):
+        return False
+    node_ids, edge_ids = {}, {}
+    A, B = _to_compact(form_a, node_ids, edge_ids), _to_compact(form_b, node_ids, edge_ids)
+    # same node and edge count, so an injective edge-preserving map is an isomorphism
+    return A.number_of_edges() == B.number_of_edges() and subgraph_match(A, B, timeout) is True
+
+class QueryCache:
+    def __init__(self, capacity=10000, path=None, tag=None):
+        # tag identifies what the results depend on (db files, options); a file with another tag is ignored
+        self.capacity = capacity
+        self.path = path
+        self.tag = tag
+        self.entries = OrderedDict()  # WL hash -> [(form, value)]
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                saved = pickle.load(f)
+            if saved.get('tag') == tag:
+                for h, bucket in saved['entries']:
+                    self.entries[h] = bucket
+                    self.size += len(bucket)
+
+    def get(self, key):
+        h, form = key
+        bucket = self.entries.get(h)
+        if bucket is not None:
+            for cached_form, value in bucket:
+                if isomorphic(form, cached_form):
+                    self.entries.move_to_end(h)
+                    self.hits += 1
+                    return value
+            self.collisions += 1
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        h, form = key
+        bucket = self.entries.setdefault(h, [])
+        for k, (cached_form, _) in enumerate(bucket):
+            if isomorphic(form, cached_form):
+                bucket[k] = (cached_form, value)
+                self.entries.move_to_end(h)
+                return
+        bucket.append((form, value))
+        self.size += 1
+        self.entries.move_to_end(h)
+        # least recently used hash buckets go first
+        while self.size > self.capacity and self.entries:
+            _, old = self.entries.popitem(last=False)
+            self.size -= len(old)
+
+    def save(self, keep=lambda value: True):
+        if not self.path:
+            return
+        entries = []
+        for h, bucket in self.entries.items():
+            bucket = [(form, value) for form, value in bucket if keep(value)]
+            if bucket:
+                entries.append((h, bucket))
+        with open(self.path + '.tmp', 'wb') as f:
+            pickle.dump({'tag': self.tag, 'entries': entries}, f)
+        os.replace(self.path + '.tmp', self.path)
+
+    def stats(self):
+        return f"cache: {self.hits} hits, {self.misses} misses, {self.collisions} hash collisions, {self.size} entries"
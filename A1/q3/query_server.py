@@ -0,0 +1,125 @@
+# long-lived query server around smart_filter: the db index is loaded once,
+# query graphs then come in over stdin or a unix socket.
+#
+# protocol: query graphs in the graphs.txt format, a line "go" ends a batch
+# (EOF also does). for every query the reply is
+#   q # <n>
+#   c # <candidate ids>
+#   ms # <latency>
+# followed by "ok" once the batch is done.
+import os
+import sys
+import json
+import time
+import contextlib
+import socketserver
+from smart_filter import _STATE, load_db, filter_one, configure, cache_tag
+from query_cache import QueryCache, graph_key
+from graph_utils import iter_graph_lines, compact_from_dict, split_args
+from feature_index import pack_bits
+from convert_to_histogram import vectorize
+
+def read_batches(lines):
+    batch = []
+    for line in lines:
+        if line.strip() == 'go':
+            yield batch
+            batch = []
+        else:
+            batch.append(line)
+    if any(l.strip() for l in batch):
+        yield batch
+
+def answer_batch(batch, schema, out, cache=None):
+    for q_num, g in enumerate(iter_graph_lines(batch), 1):
+        start = time.perf_counter()
+        Q = compact_from_dict(g, _STATE['node_vocab'], _STATE['edge_vocab'])
+        answer = None
+        if cache is not None:
+            # same ('done', (num_initial, candidates)) entries as smart_filter, so a cache file can be shared
+            key = graph_key(Q, list(_STATE['node_vocab']), list(_STATE['edge_vocab']))
+            value = cache.get(key)
+            if value is not None and value[0] == 'done':
+                answer = value[1]
+        if answer is None:
+            # vectorized against the same schema and representation as the db
+            q_vec = vectorize([g], schema, _STATE['counts'], _STATE['db_words'].dtype)
+            if not _STATE['counts']:
+                q_vec = pack_bits(q_vec)
+            num_initial, candidates, _ = filter_one(q_vec[0], Q)
+            answer = (num_initial, candidates)
+            if cache is not None:
+                cache.put(key, ('done', answer))
+        candidates = answer[1]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        out.write(f"q # {q_num}\n")
+        out.write(f"c # {' '.join(map(str, candidates))}\n")
+        out.write(f"ms # {elapsed_ms:.3f}\n")
+    out.write("ok\n")
+    out.flush()
+    if cache is not None:
+        cache.save(keep=lambda value: value[0] == 'done')
+
+def serve_stream(lines, out, schema, cache=None):
+    for batch in read_batches(lines):
+        answer_batch(batch, schema, out, cache)
+
+def serve_socket(sock_path, schema, cache=None):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            out = _SocketWriter(self.wfile)
+            serve_stream((raw.decode() for raw in self.rfile), out, schema, cache)
+
+    if os.path.exists(sock_path):
+        os.remove(sock_path)
+    # one connection at a time: the label vocab in _STATE is shared
+    with socketserver.UnixStreamServer(sock_path, Handler) as server:
+        print(f"Listening on {sock_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(sock_path)
+
+class _SocketWriter:
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text):
+        self.wfile.write(text.encode())
+
+    def flush(self):
+        self.wfile.flush()
+
+def main():
+    args, opts = split_args(sys.argv[1:], value_opts=('socket', 'pair-timeout', 'query-budget', 'cache', 'cache-file'))
+    if len(args) < 3:
+        print("Usage: python query_server.py <db_npy> <db_txt> <schema_json> [--socket PATH]"
+              " [--verify [--pair-timeout S] [--query-budget S]] [--cache N] [--cache-file F]")
+        sys.exit(1)
+
+    db_vec_path, db_graph_path, schema_file = args[:3]
+    configure(opts)
+
+    start = time.perf_counter()
+    with open(schema_file, 'r') as f:
+        schema = json.load(f)
+    # stdout is the reply stream in stdin mode, so load_db's messages go to stderr with the other logs
+    with contextlib.redirect_stdout(sys.stderr):
+        load_db(db_vec_path, db_graph_path)
+    print(f"Index loaded in {time.perf_counter() - start:.2f}s ({len(_STATE['db_graphs'])} graphs)", file=sys.stderr)
+
+    cache = None
+    if 'cache' in opts or 'cache-file' in opts:
+        cache = QueryCache(int(opts.get('cache', 10000)), opts.get('cache-file'), cache_tag(db_vec_path, db_graph_path))
+
+    try:
+        if 'socket' in opts:
+            serve_socket(opts['socket'], schema, cache)
+        else:
+            serve_stream(sys.stdin, sys.stdout, schema, cache)
+    finally:
+        if cache is not None:
+            print(cache.stats(), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
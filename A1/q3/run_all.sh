@@ -48,6 +48,11 @@ log "Input Query: $QUERY_FILE"
 log "Output Dir: $OUTPUT_DIR"
 log "========================================================"
 
+log ""
+log "[Step 0] Compile Binary Graph Stores..."
+python3 "$SCRIPT_DIR/graph_store.py" "$GRAPHS_FILE" 2>&1 | tee -a "$LOG_FILE"
+python3 "$SCRIPT_DIR/graph_store.py" "$QUERY_FILE" 2>&1 | tee -a "$LOG_FILE"
+
 log ""
 log "[Step 1] Identify Schema (Atom Labels & Degrees)..."
 bash "$SCRIPT_DIR/identify.sh" "$GRAPHS_FILE" "$SCHEMA_FILE" 2>&1 | tee -a "$LOG_FILE"
@@ -59,7 +64,11 @@ fi
 
 log ""
 log "[Step 2] Convert Database to Histogram Vectors..."
-bash "$SCRIPT_DIR/convert.sh" "$GRAPHS_FILE" "$SCHEMA_FILE" "$DB_VECS" 2>&1 | tee -a "$LOG_FILE"
+bash "$SCRIPT_DIR/convert.sh" "$GRAPHS_FILE" "$SCHEMA_FILE" "$DB_VECS" --postings 2>&1 | tee -a "$LOG_FILE"
+
+log ""
+log "[Step 2b] Group Isomorphic Database Graphs..."
+python3 "$SCRIPT_DIR/iso_classes.py" "$DB_VECS" "$GRAPHS_FILE" 2>&1 | tee -a "$LOG_FILE"
 
 log ""
 log "[Step 3] Convert Query to Histogram Vectors..."
@@ -1,66 +1,367 @@
 # took help of gemini to fix bugs and logic.
+import os
 import sys
+import multiprocessing as mp
+import time
 import numpy as np
-import networkx as nx
-from networkx.algorithms import isomorphism
-from graph_utils import parse_graphs, to_networkx, check_neighborhood_consistency
+from graph_utils import load_compact_graphs, check_neighborhood_consistency, neighborhood_signatures, split_args
+from matcher import subgraph_match
+from cascade import Cascade, Stage
+from append_db import load_manifest, segment_files, merge_postings, load_db_graphs, db_fingerprint
+from query_cache import QueryCache, graph_key
+from iso_classes import classes_path, load_classes, class_members
+from metrics import install_hooks, take_hook_totals, write_metrics, print_summary, run_profiled
+from feature_index import load_packed, contains_mask, batch_candidates, is_count_matrix, dominates_mask, unpack_bits, postings_path, load_postings, postings_mismatch, candidates_from_postings, select_postings
+
+# loaded once in the parent; forked workers see the same pages copy-on-write
+_STATE = {}
+
+def load_state(db_vec_path, q_vec_path, db_graph_path, q_graph_path):
+    print("Loading indices and graphs...")
+    load_db(db_vec_path, db_graph_path)
+    load_queries(q_vec_path, q_graph_path)
+
+def load_db(db_vec_path, db_graph_path):
+    # int32 0/1 rows, packed uint64 words or uint8/uint16 counts. the memory map is only
+    # for the dtype and postings checks, the data itself is read once below
+    db_matrix = np.load(db_vec_path, mmap_mode='r')
+    _STATE['counts'] = is_count_matrix(db_matrix)
+    if _STATE['counts']:
+        # counted features are compared as-is with q <= db
+        _STATE['db_words'] = np.load(db_vec_path)
+    else:
+        # bitset words: 64 features per uint64 instead of one int32 each
+        _STATE['db_words'] = load_packed(db_vec_path)
+
+    # posting lists built next to db_vecs.npy (convert --postings) replace the full scan
+    _STATE['postings'] = None
+    manifest = load_manifest(db_vec_path)
+    if os.path.exists(postings_path(db_vec_path)):
+        # base and every segment must match their matrices, otherwise fall back to the scan
+        pairs = [(db_vec_path, db_matrix)]
+        if manifest is not None:
+            pairs += [(seg_vecs, np.load(seg_vecs, mmap_mode='r')) for seg_vecs, _ in segment_files(db_vec_path, manifest)]
+        for vecs, matrix in pairs:
+            path = postings_path(vecs)
+            reason = postings_mismatch(path, vecs, matrix) if os.path.exists(path) else "missing"
+            if reason is not None:
+                print(f"Ignoring posting lists ({path}: {reason}); rerun convert --postings.")
+                break
+        else:
+            postings = load_postings(postings_path(db_vec_path))
+            _STATE['postings'] = postings
+            _STATE['num_feats'] = len(postings['offsets']) - 1
+            print(f"Using posting lists for {_STATE['num_feats']} features.")
+
+    # array-backed graphs, base then appended segments; db and queries share the label id vocab
+    _STATE['node_vocab'], _STATE['edge_vocab'] = {}, {}
+    _STATE['db_graphs'] = load_db_graphs(db_vec_path, db_graph_path, _STATE['node_vocab'], _STATE['edge_vocab'])
+
+    # segments added by append_db.py come after the base rows, in manifest order
+    if manifest is not None and manifest['segments']:
+        seg_words, seg_postings = [_STATE['db_words']], [_STATE['postings']]
+        for seg_vecs, _ in segment_files(db_vec_path, manifest):
+            seg_words.append(np.load(seg_vecs) if _STATE['counts'] else load_packed(seg_vecs))
+            if _STATE['postings'] is not None:
+                seg_postings.append(load_postings(postings_path(seg_vecs)))
+        _STATE['db_words'] = np.vstack(seg_words)
+        if _STATE['postings'] is not None:
+            _STATE['postings'] = merge_postings(seg_postings)
+        print(f"Loaded {len(manifest['segments'])} appended segments ({len(_STATE['db_graphs'])} graphs total).")
+
+    # isomorphism classes (iso_classes.py): only one representative per class is filtered
+    _STATE['members'] = None
+    if os.path.exists(classes_path(db_vec_path)):
+        classes = load_classes(classes_path(db_vec_path))
+        if int(classes['num_graphs']) != len(_STATE['db_graphs']):
+            print(f"Ignoring {classes_path(db_vec_path)}: built for {int(classes['num_graphs'])} graphs, "
+                  f"db has {len(_STATE['db_graphs'])} (rerun iso_classes.py)")
+        elif str(classes.get('fingerprint')) != db_fingerprint(db_vec_path, db_graph_path):
+            print(f"Ignoring {classes_path(db_vec_path)}: the db files changed since it was built (rerun iso_classes.py)")
+        else:
+            collapse_classes(classes)
+    # db neighborhood signatures are shared by every query
+    _STATE['db_sigs'] = [neighborhood_signatures(G) for G in _STATE['db_graphs']]
+    # size and label-count bounds for the cheap cascade stages
+    db_graphs = _STATE['db_graphs']
+    _STATE['db_nodes'] = np.array([G.number_of_nodes() for G in db_graphs], dtype=np.int64)
+    _STATE['db_edges'] = np.array([G.number_of_edges() for G in db_graphs], dtype=np.int64)
+    _STATE['db_node_label_counts'] = label_count_matrix([G.labels for G in db_graphs], len(_STATE['node_vocab']))
+    _STATE['db_edge_label_counts'] = label_count_matrix([G.edge_labels() for G in db_graphs], len(_STATE['edge_vocab']))
+
+def collapse_classes(classes):
+    # db rows, graphs and postings cut down to the representatives; answers are expanded in filter_one
+    reps = classes['reps']
+    _STATE['members'] = class_members(classes)
+    _STATE['db_words'] = _STATE['db_words'][reps]
+    _STATE['db_graphs'] = [_STATE['db_graphs'][r] for r in reps.tolist()]
+    if _STATE['postings'] is not None:
+        _STATE['postings'] = select_postings(_STATE['postings'], reps)
+    print(f"Collapsed {len(classes['class_of'])} db graphs into {len(reps)} isomorphism classes.")
+
+def label_count_matrix(label_arrays, num_labels):
+    # per-graph label histograms, saturated at uint16 (queries are clipped the same way, so >= stays sound)
+    sizes = [len(a) for a in label_arrays]
+    labels = np.concatenate(label_arrays).astype(np.int64) if label_arrays else np.zeros(0, dtype=np.int64)
+    rows = np.repeat(np.arange(len(label_arrays), dtype=np.int64), sizes)
+    counts = np.bincount(rows * num_labels + labels, minlength=len(label_arrays) * num_labels)
+    return np.minimum(counts, LABEL_COUNT_MAX).astype(np.uint16).reshape(len(label_arrays), num_labels)
+
+def load_queries(q_vec_path, q_graph_path):
+    q_matrix = np.load(q_vec_path)
+    if _STATE['counts'] != is_count_matrix(q_matrix):
+        print("Error: db and query vectors must both be counts (convert --counts) or both presence bits.")
+        sys.exit(1)
+    _STATE['q_words'] = q_matrix if _STATE['counts'] else load_packed(q_vec_path)
+    _STATE['q_graphs'] = load_compact_graphs(q_graph_path, _STATE['node_vocab'], _STATE['edge_vocab'])
+
+def filter_query(q_idx):
+    prefiltered = _STATE.get('prefiltered')
+    candidate_indices = prefiltered[q_idx] if prefiltered is not None else None
+    num_initial, final_candidates, stages = filter_one(_STATE['q_words'][q_idx], _STATE['q_graphs'][q_idx], candidate_indices)
+    record = None
+    if _STATE.get('metrics'):
+        record = {'query': q_idx + 1, 'stages': stages, 'hooks': take_hook_totals()}
+    return q_idx, num_initial, final_candidates, record
+
+def filter_one(q_vec, Q, candidate_indices=None):
+    # q_vec in the db's representation (packed words or counts), Q a CompactGraph.
+    # candidate_indices skips the histogram stage when it was already done (--batch).
+    # stages: (name, seconds, survivors in, survivors out) for every stage that ran
+    db_graphs = _STATE['db_graphs']
+    stages = []
+
+    start = time.perf_counter()
+    if candidate_indices is None:
+        candidate_indices = histogram_candidates(q_vec)
+        stages.append(('histogram', time.perf_counter() - start, len(db_graphs), len(candidate_indices)))
+    else:
+        # share of the --batch sweep
+        stages.append(('histogram', _STATE.get('batch_seconds', 0.0), len(db_graphs), len(candidate_indices)))
+
+    # size, label-count and neighborhood checks, in the order the cascade currently ranks best
+    survivors, cascade_stages = _STATE['cascade'].run(Q, np.asarray(candidate_indices, dtype=np.int64),
+                                                     query_class(Q))
+    stages.extend(cascade_stages)
+    # add to list (1-indexed for the output file)
+    final_candidates = [db_idx + 1 for db_idx in survivors.tolist()]
+
+    if _STATE['verify']:
+        start = time.perf_counter()
+        n_in = len(final_candidates)
+        final_candidates = verify_candidates(Q, final_candidates)
+        stages.append(('verify', time.perf_counter() - start, n_in, len(final_candidates)))
+
+    if _STATE.get('members') is not None:
+        # class ids back to every member graph
+        members = _STATE['members']
+        final_candidates = [m for cls in final_candidates for m in members[cls - 1]]
+    return len(candidate_indices), sorted(final_candidates), stages
+
+LABEL_COUNT_MAX = np.iinfo(np.uint16).max
+
+def query_class(Q):
+    # stage statistics are kept per query size bucket (powers of two in node count)
+    return Q.number_of_nodes().bit_length()
+
+def node_count_stage(candidates, Q):
+    return candidates[_STATE['db_nodes'][candidates] >= Q.number_of_nodes()]
+
+def edge_count_stage(candidates, Q):
+    return candidates[_STATE['db_edges'][candidates] >= Q.number_of_edges()]
+
+def query_label_counts(Q):
+    n_ids, n_cnt = np.unique(Q.labels, return_counts=True)
+    e_ids, e_cnt = np.unique(Q.edge_labels(), return_counts=True)
+    return n_ids, np.minimum(n_cnt, LABEL_COUNT_MAX), e_ids, np.minimum(e_cnt, LABEL_COUNT_MAX)
+
+def label_count_stage(candidates, q_counts):
+    # a db graph needs at least as many nodes (and edges) of every label as the query
+    n_ids, n_cnt, e_ids, e_cnt = q_counts
+    node_counts, edge_counts = _STATE['db_node_label_counts'], _STATE['db_edge_label_counts']
+    if (len(n_ids) and n_ids[-1] >= node_counts.shape[1]) or (len(e_ids) and e_ids[-1] >= edge_counts.shape[1]):
+        # a label first seen in the queries, no db graph has it
+        return candidates[:0]
+    keep = np.all(node_counts[np.ix_(candidates, n_ids)] >= n_cnt, axis=1)
+    keep &= np.all(edge_counts[np.ix_(candidates, e_ids)] >= e_cnt, axis=1)
+    return candidates[keep]
+
+def query_signatures(Q):
+    return Q, neighborhood_signatures(Q)
+
+def neighborhood_stage(candidates, q_ctx):
+    Q, q_sigs = q_ctx
+    db_graphs, db_sigs = _STATE['db_graphs'], _STATE['db_sigs']
+    return np.array([db_idx for db_idx in candidates.tolist()
+                     if check_neighborhood_consistency(db_graphs[db_idx], Q, db_sigs[db_idx], q_sigs)], dtype=np.int64)
+
+def filter_stages():
+    # declared costs are rough microseconds per candidate
+    return [
+        Stage('node_count', 0.05, node_count_stage),
+        Stage('edge_count', 0.05, edge_count_stage),
+        Stage('label_counts', 0.5, label_count_stage, query_label_counts),
+        Stage('neighborhood', 20.0, neighborhood_stage, query_signatures),
+    ]
+
+def histogram_candidates(q_vec):
+    postings = _STATE['postings']
+    if _STATE['counts']:
+        if postings is not None:
+            # posting lists narrow by presence, the counts are then checked on those rows only
+            candidate_indices = candidates_from_postings(postings, q_vec)
+            candidate_indices = candidate_indices[dominates_mask(q_vec, _STATE['db_words'][candidate_indices])]
+        else:
+            candidate_indices = np.where(dominates_mask(q_vec, _STATE['db_words']))[0]
+    elif postings is not None:
+        # only graphs that appear in every posting list of the query's features
+        candidate_indices = candidates_from_postings(postings, unpack_bits(q_vec, _STATE['num_feats']))
+    else:
+        # global bitmask check: db must have at least what query has
+        survivors_mask = contains_mask(q_vec, _STATE['db_words'])
+        candidate_indices = np.where(survivors_mask)[0]
+    return candidate_indices
+
+def verify_candidates(Q, candidates):
+    # exact matching; a pair that times out (or is past the query budget) stays in as a candidate
+    pair_timeout, budget = _STATE['pair_timeout'], _STATE['query_budget']
+    deadline = time.perf_counter() + budget
+    verified = []
+    for k, cand in enumerate(candidates):
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            verified.extend(candidates[k:])
+            break
+        if subgraph_match(Q, _STATE['db_graphs'][cand - 1], timeout=min(pair_timeout, remaining)) is not False:
+            verified.append(cand)
+    return verified
+
+def configure(opts):
+    # --verify turns the candidate list into exact answers
+    _STATE['verify'] = bool(opts.get('verify'))
+    _STATE['pair_timeout'] = float(opts.get('pair-timeout', 1.0))
+    _STATE['query_budget'] = float(opts.get('query-budget', 30.0))
+    # --fixed-order runs the cascade stages by declared cost instead of re-ranking them
+    _STATE['cascade'] = Cascade(filter_stages(), adaptive=not opts.get('fixed-order'))
 
 def main():
-    if len(sys.argv) < 6:
-        print("Usage: python smart_filter.py <db_npy> <q_npy> <db_txt> <q_txt> <out_dat>")
+    args, opts = split_args(sys.argv[1:], value_opts=('workers', 'pair-timeout', 'query-budget', 'cache', 'cache-file',
+                                                      'metrics', 'profile'))
+    if len(args) < 5:
+        print("Usage: python smart_filter.py <db_npy> <q_npy> <db_txt> <q_txt> <out_dat> [--workers N] [--batch]"
+              " [--verify [--pair-timeout S] [--query-budget S]] [--fixed-order] [--cache N] [--cache-file F]"
+              " [--metrics out.json|out.csv [--hooks]] [--profile out.prof]")
         sys.exit(1)
 
-    db_vec_path = sys.argv[1]
-    q_vec_path = sys.argv[2]
-    db_graph_path = sys.argv[3]
-    q_graph_path = sys.argv[4]
-    out_path = sys.argv[5]
+    if 'profile' in opts:
+        # cProfile of the parent process; use without --workers to see the filter itself
+        profile_path = opts.pop('profile')
+        return run_profiled(lambda: run(args, opts), profile_path)
+    run(args, opts)
 
-    print("Loading indices and graphs...")
-    db_matrix = np.load(db_vec_path)
-    q_matrix = np.load(q_vec_path)
-    
-    # get raw data
-    db_graphs_raw = parse_graphs(db_graph_path)
-    q_graphs_raw = parse_graphs(q_graph_path)
-    
-    # move everything to nx objects
-    db_nx = [to_networkx(g) for g in db_graphs_raw]
-    q_nx = [to_networkx(g) for g in q_graphs_raw]
-
-    nm = isomorphism.categorical_node_match('label', None)
-    em = isomorphism.categorical_edge_match('label', None)
-
-    with open(out_path, 'w') as f:
-        for q_idx, q_vec in enumerate(q_matrix):
-            # global bitmask check: db must have at least what query has
-            survivors_mask = np.all(q_vec <= db_matrix, axis=1)
-            candidate_indices = np.where(survivors_mask)[0]
-            
-            final_candidates = []
-            Q = q_nx[q_idx]
-            
-            for db_idx in candidate_indices:
-                G = db_nx[db_idx]
-                
-                # fast edge count check
-                if G.number_of_edges() < Q.number_of_edges():
-                    continue
-                    
-                # neighborhood structure check
-                if not check_neighborhood_consistency(G, Q):
-                    continue
-
-                # add to list (1-indexed for the output file)
-                final_candidates.append(db_idx + 1)
-
-            # write query and results
-            final_candidates = sorted(final_candidates)
-            f.write(f"q # {q_idx + 1}\n")
-            f.write(f"c # {' '.join(map(str, final_candidates))}\n")
-            
-            if q_idx % 10 == 0:
-                print(f"Query {q_idx + 1}: {len(candidate_indices)} initial -> {len(final_candidates)} filtered.")
+def run(args, opts):
+    db_vec_path, q_vec_path, db_graph_path, q_graph_path, out_path = args[:5]
+    workers = int(opts.get('workers', 1))
+    configure(opts)
+    # --metrics F: per-query stage timings and survivor counts; --hooks adds per-function timers
+    _STATE['metrics'] = 'metrics' in opts
+    if _STATE['metrics'] and opts.get('hooks'):
+        install_hooks(sys.modules[__name__], ['histogram_candidates', 'neighborhood_signatures',
+                                              'check_neighborhood_consistency', 'verify_candidates'])
+
+    load_state(db_vec_path, q_vec_path, db_graph_path, q_graph_path)
+    num_queries = len(_STATE['q_words'])
+    # load-time calls are not part of any query
+    take_hook_totals()
+
+    if opts.get('batch'):
+        # histogram stage for every query at once, blocked over db tiles
+        start = time.perf_counter()
+        _STATE['prefiltered'] = batch_candidates(_STATE['q_words'], _STATE['db_words'], _STATE['counts'])
+        _STATE['batch_seconds'] = (time.perf_counter() - start) / max(1, num_queries)
+        print(f"Batched histogram filter: {num_queries} queries in {time.perf_counter() - start:.2f}s")
+
+    # --cache N / --cache-file F: repeated and isomorphic queries reuse earlier answers
+    cache, cached, links = None, {}, {}
+    to_run = list(range(num_queries))
+    if 'cache' in opts or 'cache-file' in opts:
+        cache = QueryCache(int(opts.get('cache', 10000)), opts.get('cache-file'), cache_tag(db_vec_path, db_graph_path))
+        to_run, cached, links, keys = plan_with_cache(cache, num_queries)
+
+    pool = None
+    if workers > 1:
+        # fork so the index is inherited instead of pickled to every worker
+        pool = mp.get_context('fork').Pool(workers)
+        chunk = max(1, len(to_run) // (workers * 8))
+        # imap keeps the original query order
+        results = pool.imap(filter_query, to_run, chunksize=chunk)
+    else:
+        results = map(filter_query, to_run)
+
+    try:
+        with open(out_path, 'w') as f:
+            records = []
+            done = {}
+            next_q = 0
+            for q_idx, num_initial, final_candidates, record in results:
+                done[q_idx] = (num_initial, final_candidates)
+                if record is not None:
+                    records.append(record)
+                if cache is not None:
+                    cache.put(keys[q_idx], ('done', done[q_idx]))
+                # write every query whose answer is known, in the original order
+                while next_q < num_queries:
+                    answer = cached.get(next_q) or done.get(links.get(next_q, next_q))
+                    if answer is None:
+                        break
+                    write_answer(f, next_q, *answer)
+                    next_q += 1
+            for q_idx in range(next_q, num_queries):
+                write_answer(f, q_idx, *(cached.get(q_idx) or done[links.get(q_idx, q_idx)]))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    if cache is not None:
+        print(cache.stats())
+        cache.save(keep=lambda value: value[0] == 'done')
+
+    if _STATE.get('metrics'):
+        print("Per-stage totals:")
+        print_summary(records)
+        write_metrics(opts['metrics'], records)
+        print(f"Metrics written to {opts['metrics']}")
+
+def write_answer(f, q_idx, num_initial, final_candidates):
+    # write query and results
+    f.write(f"q # {q_idx + 1}\n")
+    f.write(f"c # {' '.join(map(str, final_candidates))}\n")
+
+    if q_idx % 10 == 0:
+        print(f"Query {q_idx + 1}: {num_initial} initial -> {len(final_candidates)} filtered.")
+
+def cache_tag(db_vec_path, db_graph_path):
+    # cached answers are only valid for the same db files and the same verify settings;
+    # verified answers keep timed-out pairs, so they depend on the time limits too
+    verify = (True, _STATE['pair_timeout'], _STATE['query_budget']) if _STATE['verify'] else (False,)
+    return (db_fingerprint(db_vec_path, db_graph_path), verify)
+
+def plan_with_cache(cache, num_queries):
+    # split queries into cache hits, duplicates of an earlier query in this run, and real work
+    node_vocab, edge_vocab = list(_STATE['node_vocab']), list(_STATE['edge_vocab'])
+    to_run, cached, links, keys = [], {}, {}, {}
+    for q_idx in range(num_queries):
+        keys[q_idx] = graph_key(_STATE['q_graphs'][q_idx], node_vocab, edge_vocab)
+        value = cache.get(keys[q_idx])
+        if value is None:
+            cache.put(keys[q_idx], ('pending', q_idx))
+            to_run.append(q_idx)
+        elif value[0] == 'pending':
+            links[q_idx] = value[1]
+        else:
+            cached[q_idx] = value[1]
+    return to_run, cached, links, keys
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()